@@ -1,71 +1,353 @@
-from flask import Flask, request, jsonify, make_response
-from models import db, Student, Course, Enrollment
+"""Student Enrollment System API.
+
+The Flask app is built by ``create_app()``; importing this module does no
+configuration, DB connection or schema work. Schema creation and the password
+migration are an explicit step: ``flask --app app init-db`` or ``python app.py
+init-db``. ``app:EnrollmentSystem`` still works as a WSGI target and builds the
+app on first access.
+
+Import cost can be checked with ``python -X importtime -c "import app"``.
+"""
+from flask import Blueprint, Flask, current_app, request, jsonify, make_response, Response, send_file, stream_with_context
+from models import db, Student, Course, Enrollment, EnrollmentArchive, PrerequisiteStats, ArchivedSemester
+from seat_updates import SeatUpdateHub, PostgresSeatRelay
+import stats
+import export
+import provisioning
+import auth_tokens
+import archive
+from coalesce import SingleFlight, coalesced
+import catalog_snapshot
+from profiling import RequestProfiler
 from sqlalchemy import or_, func
 from sqlalchemy.orm import joinedload
+from werkzeug.utils import secure_filename
+import functools
+import hmac
 import os
-from dotenv import load_dotenv
+import secrets
+import tempfile
+import time
 from datetime import datetime, timezone
-from flask_cors import CORS
 import flask_login
 
 
-# Load local .env in development (no-op if not present)
-load_dotenv()
+api = Blueprint("api", __name__)
+
+login_manager = flask_login.LoginManager()
+login_manager.login_view = "login"
+
+profiler = RequestProfiler()
+
+# Apps created in this process, so their DB pools can be reset after a fork
+_apps = []
+
+
+def create_app(config=None):
+    """Build and configure the Flask app. Only reads configuration; no DB access."""
+    from dotenv import load_dotenv
+    from flask_cors import CORS
+
+    # Load local .env in development (no-op if not present)
+    load_dotenv()
+
+    app = Flask(__name__)
+
+    # Enable Cors; browsers may reuse a preflight answer for 10 minutes
+    CORS(app, max_age=600)
+
+    # Get Postgres URL from DB_URL (or DATABASE_URL)
+    db_url = os.environ.get("DB_URL") or os.environ.get("DATABASE_URL")
+    if config and config.get("SQLALCHEMY_DATABASE_URI"):
+        db_url = config["SQLALCHEMY_DATABASE_URI"]
+    if not db_url:
+        raise RuntimeError("DB_URL (or DATABASE_URL) environment variable is not set.")
+
+    app.config["SQLALCHEMY_DATABASE_URI"] = db_url
+    app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
+
+    # Tunables, read here (after .env is loaded) rather than at import; `config` overrides them
+    # Micro-cache lifetime of coalesced catalog reads, in seconds
+    app.config["READ_CACHE_TTL"] = float(os.environ.get("READ_CACHE_TTL", "0.5"))
+    # Measured cost per stream: ~10 KB and ~35 us of CPU per pushed batch (see README)
+    app.config["SEAT_STREAM_MAX_SUBSCRIBERS"] = int(os.environ.get("SEAT_STREAM_MAX_SUBSCRIBERS", "5000"))
+    # Slow-request log threshold (ms) and size, see profiling.py
+    app.config["SLOW_REQUEST_MS"] = float(os.environ.get("SLOW_REQUEST_MS", "500"))
+    app.config["SLOW_REQUEST_LOG"] = int(os.environ.get("SLOW_REQUEST_LOG", "200"))
+    # Seconds between checks of the catalog_version counter (one PK read)
+    app.config["CATALOG_CHECK_INTERVAL"] = float(os.environ.get("CATALOG_CHECK_INTERVAL", "2"))
+    # ~0.1s of password hashing per row; keeps a bulk request well inside worker timeouts
+    app.config["BULK_REGISTER_MAX_ROWS"] = int(os.environ.get("BULK_REGISTER_MAX_ROWS", "100"))
+
+    if config:
+        app.config.update(config)
+
+    # Signs sessions and auth tokens. A random per-process key would make tokens
+    # fail across restarts and workers, so it is only allowed for debug/testing.
+    if not app.config.get("SECRET_KEY"):
+        secret_key = os.environ.get("SECRET_KEY")
+        if not secret_key:
+            if not (app.debug or app.testing):
+                raise RuntimeError("SECRET_KEY environment variable is not set.")
+            print("SECRET_KEY is not set; using a random key for this process.")
+            secret_key = secrets.token_hex(32)
+        app.config["SECRET_KEY"] = secret_key
+
+    # Engines are created here but connect lazily on first query
+    db.init_app(app)
+    login_manager.init_app(app)
+    profiler.init_app(app)
+    app.register_blueprint(api)
+
+    @app.cli.command("init-db")
+    def init_db_command():
+        """Create tables and run the password migration."""
+        init_db(app)
+        print("Database initialized.")
+
+    _apps.append(app)
+    return app
+
+
+def init_db(app):
+    """Create all tables in models.py and migrate plaintext passwords."""
+    with app.app_context():
+        # fail fast with clear error
+        try:
+            db.create_all()
+            # create_all skips tables that already exist, so add indexes added later
+            for index in Enrollment.__table__.indexes:
+                index.create(bind=db.engine, checkfirst=True)
+        except Exception as e:
+            raise RuntimeError(f"Failed to create DB tables: {e}") from e
+
+        # Triggers that bump catalog_version so workers notice catalog changes
+        try:
+            if not catalog_snapshot.install_version_triggers():
+                print("Catalog version triggers are not supported on this database; "
+                      f"snapshots are re-checked every {CATALOG_FALLBACK_INTERVAL:.0f}s.")
+        except Exception as e:
+            print(f"Catalog version triggers not installed: {e}")
+
+        # Migrate any existing plaintext passwords to secure hashes.
+        # This is a best-effort migration that won't prevent the app from
+        # starting if something goes wrong.
+        try:
+            students = Student.query.all()
+            changed = False
+            for s in students:
+                # If the password exists and does not look like a werkzeug hash,
+                # re-hash it using the model's setter which avoids double-hashing.
+                if s.password and not (isinstance(s.password, str) and s.password.startswith("pbkdf2:")):
+                    s.set_password(s.password)
+                    changed = True
+            if changed:
+                db.session.commit()
+        except Exception as e:
+            # Don't fail app startup for migration issues; print a diagnostic.
+            print(f"Password migration skipped or failed: {e}")
+
+
+def _reset_pools_after_fork():
+    # Connections inherited from a preloading parent must not be shared, so
+    # each worker starts with empty pools (without closing the parent's sockets).
+    for app in _apps:
+        with app.app_context():
+            for engine in db.engines.values():
+                engine.dispose(close=False)
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_pools_after_fork)
+
+
+_default_app = None
+
+
+def __getattr__(name):
+    # Lazily build the default app for `app:EnrollmentSystem` style imports.
+    global _default_app
+    if name == "EnrollmentSystem":
+        if _default_app is None:
+            _default_app = create_app()
+        return _default_app
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+# Session lookups are served from a short-lived cache of DB-free AuthUser objects
+user_cache = auth_tokens.TTLCache(maxsize=4096, ttl=60.0)
+
+
+@login_manager.user_loader
+def load_user(student_id):
+    try:
+        key = int(student_id)
+    except (TypeError, ValueError):
+        return None
+    user = user_cache.get(key)
+    if user is None:
+        student = Student.query.get(key)
+        if not student:
+            return None
+        user = auth_tokens.AuthUser.from_student(student)
+        user_cache.set(key, user)
+    return user
 
-# Initialize app
-EnrollmentSystem = Flask(__name__)
 
-# Enable Cors
-CORS(EnrollmentSystem)
+@login_manager.request_loader
+def load_user_from_token(req):
+    """Authenticate 'Authorization: Bearer <token>' requests without touching the DB"""
+    token = auth_tokens.token_from_request(req)
+    if not token:
+        return None
+    return auth_tokens.verify_token(current_app.config["SECRET_KEY"], token)
 
-# Get Postgres URL from either DB_URL or DATABASE_URL
-db_url = os.environ.get("DB_URL")
-if not db_url:
-    raise RuntimeError("DB_URL (or DATABASE_URL) environment variable is not set.")
 
+@login_manager.unauthorized_handler
+def unauthorized():
+    return make_response(jsonify({"message": "authentication required"}), 401)
 
-EnrollmentSystem.config["SQLALCHEMY_DATABASE_URI"] = db_url
-EnrollmentSystem.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
 
-# Configure app to postgres
-db.init_app(EnrollmentSystem)
+# Identical concurrent catalog reads share one computation; successful
+# responses are also micro-cached until a write changes what they show.
+read_flight = SingleFlight()
 
-# Create all tables in models.py (fail fast with clear error)
-with EnrollmentSystem.app_context():
+
+def invalidates_read_cache(view):
+    """For writes to courses, enrollments or roster names: clear the read micro-cache
+    when they succeed. Logins, registrations and admin calls leave it alone.
+    """
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        response = make_response(view(*args, **kwargs))
+        if response.status_code < 400:
+            read_flight.clear_cache()
+        return response
+
+    return wrapper
+
+
+# Compact catalog snapshot shared by all workers through a memory-mapped file
+catalog_reader = catalog_snapshot.SnapshotReader()
+
+
+def publish_catalog_snapshot():
+    """Re-publish the catalog snapshot after a catalog change (best-effort)."""
     try:
-        db.create_all()
+        if catalog_snapshot.publish_snapshot(catalog_reader.path):
+            catalog_reader.invalidate()
     except Exception as e:
-        raise RuntimeError(f"Failed to create DB tables: {e}") from e
+        print(f"Catalog snapshot publish failed: {e}")
+
+
+# Per process: pid, last catalog_version seen, when it was checked and last published
+_catalog_state = {"pid": None, "version": None, "checked": 0.0, "published": 0.0}
+# Without the version counter (other databases, init-db not run yet) the snapshot
+# is rebuilt and digest-compared this often instead
+CATALOG_FALLBACK_INTERVAL = 60.0
 
-    # Migrate any existing plaintext passwords to secure hashes.
-    # This is a best-effort migration that won't prevent the app from
-    # starting if something goes wrong.
+
+def _refresh_catalog_if_changed():
+    """Re-publish the snapshot on the first call in each worker and whenever the
+    catalog_version counter moves (checked every CATALOG_CHECK_INTERVAL seconds).
+    Publishing is a no-op when the file's digest already matches.
+    """
+    state = _catalog_state
+    now = time.monotonic()
+    first = state["pid"] != os.getpid()
+    if not first and now - state["checked"] < current_app.config["CATALOG_CHECK_INTERVAL"]:
+        return
     try:
-        students = Student.query.all()
-        changed = False
-        for s in students:
-            # If the password exists and does not look like a werkzeug hash,
-            # re-hash it using the model's setter which avoids double-hashing.
-            if s.password and not (isinstance(s.password, str) and s.password.startswith("pbkdf2:")):
-                s.set_password(s.password)
-                changed = True
-        if changed:
+        version = catalog_snapshot.catalog_version()
+    except Exception:
+        version = None
+    fallback_due = version is None and now - state["published"] >= CATALOG_FALLBACK_INTERVAL
+    if first or fallback_due or version != state["version"]:
+        publish_catalog_snapshot()
+        state["published"] = now
+    state.update(pid=os.getpid(), version=version, checked=now)
+
+
+def get_catalog():
+    """Current catalog snapshot, or None if unavailable (callers fall back to the ORM)."""
+    try:
+        _refresh_catalog_if_changed()
+        snapshot = catalog_reader.get()
+        if snapshot is None:
+            publish_catalog_snapshot()
+            snapshot = catalog_reader.get()
+        return snapshot
+    except Exception as e:
+        print(f"Catalog snapshot unavailable: {e}")
+        return None
+
+
+def enrollment_totals(course_ids=None):
+    """Seats taken per course: rows with status 'enrolled', the count enroll_student
+    checks against capacity. One grouped query; used by /courses, /courses/search
+    and the seat stream so they all report the same 'enrolled' figure.
+    """
+    query = db.session.query(Enrollment.course_id, func.count(Enrollment.id)).filter(
+        Enrollment.status == "enrolled"
+    )
+    if course_ids is not None:
+        query = query.filter(Enrollment.course_id.in_(course_ids))
+    return dict(query.group_by(Enrollment.course_id).all())
+
+
+def course_json_with_seats(course, totals):
+    """Course.json() with 'enrolled' taken from enrollment_totals()."""
+    data = course.json()
+    data["enrolled"] = totals.get(course.id, 0)
+    return data
+
+
+# Live seat-count updates pushed to the course catalog. Each process fans out to
+# its own subscribers; with PostgreSQL the relay carries updates between processes.
+seat_hub = SeatUpdateHub()
+seat_relay = PostgresSeatRelay(seat_hub)
+
+
+def _relay_enabled():
+    return db.engine.dialect.name == "postgresql"
+
+
+def publish_seat_counts(*course_ids):
+    """Push the current enrolled/capacity numbers for the given courses to subscribers.
+    Best-effort: called after a commit, so failures are logged and never fail the request.
+    """
+    ids = [cid for cid in set(course_ids) if cid is not None]
+    if not ids:
+        return
+    try:
+        totals = enrollment_totals(ids)
+        capacities = db.session.query(Course.id, Course.max_students).filter(Course.id.in_(ids)).all()
+        seats = [(course_id, totals.get(course_id, 0), capacity) for course_id, capacity in capacities]
+        if _relay_enabled():
+            seat_relay.notify(db.session, seats)
             db.session.commit()
+        else:
+            for course_id, enrolled, capacity in seats:
+                seat_hub.publish(course_id, enrolled, capacity)
     except Exception as e:
-        # Don't fail app startup for migration issues; print a diagnostic.
-        print(f"Password migration skipped or failed: {e}")
+        db.session.rollback()
+        print(f"Seat update publish failed: {e}")
 
-login_manager = flask_login.LoginManager()
-login_manager.login_view = "login"
-login_manager.init_app(EnrollmentSystem)
 
+# Admin-only endpoints require ADMIN_TOKEN, sent as the X-Admin-Token header
+def admin_required(view):
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        expected = os.environ.get("ADMIN_TOKEN")
+        supplied = request.headers.get("X-Admin-Token", "")
+        if not expected or not hmac.compare_digest(supplied, expected):
+            return make_response(jsonify({"message": "admin access required"}), 403)
+        return view(*args, **kwargs)
 
-@login_manager.user_loader
-def load_user(student_id):
-    return Student.query.get(student_id)
+    return wrapper
 
 
-@EnrollmentSystem.route("/", methods=["GET"])
+@api.route("/", methods=["GET"])
 def home():
     """Root endpoint - API information """
     return make_response(
@@ -85,6 +367,7 @@ def home():
                     "courses": {
                         "GET /courses": "Get all courses",
                         "POST /courses": "Create a new course",
+                        "GET /courses/seats/stream": "Live seat-count updates (server-sent events)",
                         "GET /courses/<id>/students": "Get students in a course",
                     },
                     "enrollments": {
@@ -92,10 +375,34 @@ def home():
                         "DELETE /enrollments/<id>": "Drop a course",
                     },
                     "login": {
-                        "POST /login_students": "Login a student",
+                        "POST /login_students": "Login a student (returns a bearer token)",
+                        "GET /me": "Current student from session or bearer token",
                         "POST /logout_students": "Logout a student",
                     },
-                    "register": {"POST /register_students": "Register a student"},
+                    "register": {
+                        "POST /register_students": "Register a student",
+                        "POST /register_students/bulk": "Register many students from CSV or JSON (admin, capped per request)",
+                    },
+                    "exports": {
+                        "GET /exports/enrollments?semester=<s>&format=csv|arrow|parquet": "Export a semester's enrollments (admin)",
+                    },
+                    "semesters": {
+                        "GET /semesters/archived": "List archived semesters",
+                        "POST /semesters/<semester>/archive": "Move a closed semester out of the active enrollments (admin, ?force=true)",
+                    },
+                    "admin": {
+                        "GET /admin/latency": "Per-route latency histograms",
+                        "GET /admin/slow-requests": "Recent slow or failed requests with their SQL",
+                        "POST /admin/profile": "Start stack sampling for N seconds",
+                        "GET /admin/profile?format=collapsed": "Sampling status or collapsed stacks",
+                    },
+                    "stats": {
+                        "GET /stats/courses": "Enrollment counts and fill rate for all courses",
+                        "GET /stats/courses/<id>": "Enrollment counts and fill rate for a course",
+                        "GET /stats/semesters/<semester>/credits": "Credit-load distribution for a semester",
+                        "GET /stats/prerequisites": "Prerequisite pass-through rates",
+                        "POST /stats/refresh": "Rebuild statistics from enrollments (admin)",
+                    },
                 },
             }
         ),
@@ -103,7 +410,7 @@ def home():
     )
 
 
-@EnrollmentSystem.route("/students", methods=["GET"])
+@api.route("/students", methods=["GET"])
 def get_students():
     """Get all students in the system"""
     try:
@@ -115,7 +422,7 @@ def get_students():
         )
 
 
-@EnrollmentSystem.route("/students/<int:student_id>", methods=["GET"])
+@api.route("/students/<int:student_id>", methods=["GET"])
 def get_student(student_id):
     """Query the database to get a a student by student_id"""
     try:
@@ -126,7 +433,7 @@ def get_student(student_id):
             jsonify({"message": "Could not find Student in Database"}), 409
         )
 
-@EnrollmentSystem.route("/students/search/", methods=["GET"])
+@api.route("/students/search/", methods=["GET"])
 def search_student():
     """Searches database for a student by name or g_number(external id) based on search query"""
     try:
@@ -147,7 +454,8 @@ def search_student():
     except Exception as e:
         return make_response(jsonify({"message": "error searching students", "error": str(e)}), 500)
 
-@EnrollmentSystem.route("/students/<int:student_id>", methods=["PATCH"])
+@api.route("/students/<int:student_id>", methods=["PATCH"])
+@invalidates_read_cache
 def update_student(student_id):
     """Update student information in the database"""
     try:
@@ -169,6 +477,7 @@ def update_student(student_id):
             student.year = data["year"]
 
         db.session.commit()
+        user_cache.pop(student.id)
         return make_response(
             jsonify(
                 {"message": "student updated successfully", "student": student.json()}
@@ -183,13 +492,15 @@ def update_student(student_id):
         )
 
 
-@EnrollmentSystem.route("/students/<int:student_id>", methods=["DELETE"])
+@api.route("/students/<int:student_id>", methods=["DELETE"])
+@invalidates_read_cache
 def delete_student(student_id):
     """Delete student data from the database"""
     try:
         student = Student.query.get_or_404(student_id)
         db.session.delete(student)
         db.session.commit()
+        user_cache.pop(student_id)
         return make_response(
             jsonify({"message": "student data deleted successfully"}), 200
         )
@@ -200,7 +511,7 @@ def delete_student(student_id):
         )
 
 
-@EnrollmentSystem.route("/students/<int:student_id>/courses", methods=["GET"])
+@api.route("/students/<int:student_id>/courses", methods=["GET"])
 def get_student_courses(student_id):
     """Get all courses for a specific student"""
     try:
@@ -208,12 +519,20 @@ def get_student_courses(student_id):
         # Return full course objects for each enrollment so clients get the canonical Course shape
         courses = [enrollment.course.json() for enrollment in student.enrollments]
         enrollments_meta = [enrollment.json() for enrollment in student.enrollments]
+        # Enrollments of archived semesters live in enrollments_archive
+        archived = (
+            EnrollmentArchive.query.options(joinedload(EnrollmentArchive.course))
+            .filter_by(student_id=student.id)
+            .order_by(EnrollmentArchive.enrolled_date)
+            .all()
+        )
         return make_response(
             jsonify(
                 {
                     "student": student.student_name,
                     "courses": courses,
                     "enrollments": enrollments_meta,
+                    "archived": [enrollment.json() for enrollment in archived],
                 }
             ),
             200,
@@ -227,24 +546,41 @@ def get_student_courses(student_id):
         )
 
 
-@EnrollmentSystem.route("/courses", methods=["GET"])
+@api.route("/courses", methods=["GET"])
+@coalesced(read_flight, ttl="READ_CACHE_TTL")
 def get_courses():
     """Get all courses in the database"""
     try:
+        catalog = get_catalog()
+        if catalog is not None:
+            totals = enrollment_totals()
+            return make_response(
+                jsonify([catalog.course_json(row, totals.get(catalog.ids[row], 0)) for row in range(len(catalog))]),
+                200,
+            )
         courses = Course.query.all()
-        return make_response(jsonify([course.json() for course in courses]), 200)
+        totals = enrollment_totals()
+        return make_response(jsonify([course_json_with_seats(course, totals) for course in courses]), 200)
     except Exception as e:
         return make_response(
             jsonify({"message": "error getting courses", "error": str(e)}), 500
         )
 
 
-@EnrollmentSystem.route("/courses/search", methods=["GET"])
+@api.route("/courses/search", methods=["GET"])
+@coalesced(read_flight, ttl="READ_CACHE_TTL")
 def search_courses():
     """Search courses by query string across name, code, description, instructor."""
     try:
         q = request.args.get("q")
         q = (q or "").strip()
+        catalog = get_catalog()
+        if catalog is not None:
+            rows = catalog.search(q) if q else range(len(catalog))
+            totals = enrollment_totals()
+            return make_response(
+                jsonify([catalog.course_json(row, totals.get(catalog.ids[row], 0)) for row in rows]), 200
+            )
         if q == "":
             # no query — return all courses
             courses = Course.query.all()
@@ -258,14 +594,16 @@ def search_courses():
                 )
             ).all()
 
-        return make_response(jsonify([course.json() for course in courses]), 200)
+        totals = enrollment_totals()
+        return make_response(jsonify([course_json_with_seats(course, totals) for course in courses]), 200)
     except Exception as e:
         return make_response(
             jsonify({"message": "error searching courses", "error": str(e)}), 500
         )
 
 
-@EnrollmentSystem.route("/courses", methods=["POST"])
+@api.route("/courses", methods=["POST"])
+@invalidates_read_cache
 def create_course():
     """Adds a new course to the database"""
     try:
@@ -296,6 +634,8 @@ def create_course():
                 new_course.prerequisites = resolved
         db.session.add(new_course)
         db.session.commit()
+        publish_catalog_snapshot()
+        publish_seat_counts(new_course.id)
         return make_response(
             jsonify({"message": "course created", "course": new_course.json()}), 201
         )
@@ -306,7 +646,8 @@ def create_course():
         )
 
 
-@EnrollmentSystem.route("/enrollments", methods=["POST"])
+@api.route("/enrollments", methods=["POST"])
+@invalidates_read_cache
 def enroll_student():
     """Register a student for a course"""
     try:
@@ -346,28 +687,17 @@ def enroll_student():
         if not course:
             return make_response(jsonify({'message': 'course not found'}), 404)
         
-        # Check prerequisites: student must have completed all prerequisite courses
-        missing = []
-        for prereq in course.prerequisites:
-            completed = Enrollment.query.filter_by(
-                student_id=student.id,
-                course_id=prereq.id,
-                status='completed'
-            ).first()
-            if not completed:
-                missing.append(prereq.course_name)
-        if missing:
-            return make_response(jsonify({'message': 'missing prerequisites', 'missing': missing}), 400)
-
+        # Archived semesters are closed: their rows live in enrollments_archive
+        semester = data.get("semester")
+        if semester and archive.is_archived(semester):
+            return make_response(
+                jsonify({"message": f"semester {semester} is archived and closed for enrollment"}), 400
+            )
 
         # Check prerequisites: student must have completed all prerequisite courses
-        missing = []
-        for prereq in course.prerequisites:
-            completed = Enrollment.query.filter_by(
-                student_id=student.id, course_id=prereq.id, status="completed"
-            ).first()
-            if not completed:
-                missing.append(prereq.course_name)
+        # (in an active semester or recorded in the archived-completions summary)
+        completed_ids = archive.completed_course_ids(student.id)
+        missing = [p.course_name for p in course.prerequisites if p.id not in completed_ids]
         if missing:
             return make_response(
                 jsonify({"message": "missing prerequisites", "missing": missing}), 400
@@ -379,7 +709,7 @@ def enroll_student():
             course_id=course.id,
         ).first()
 
-        if existing_enrollment:
+        if existing_enrollment or course.id in completed_ids:
             return make_response(
                 jsonify({"message": "student already enrolled in this course"}), 400
             )
@@ -392,7 +722,6 @@ def enroll_student():
             return make_response(jsonify({"message": "course is full"}), 400)
 
         # Enforce per-semester credit limit (max 18 credits)
-        semester = data.get("semester")
         try:
             # Sum the credits of student's currently enrolled courses in the same semester
             enrolled_credits_row = (
@@ -435,7 +764,11 @@ def enroll_student():
         )
 
         db.session.add(new_enrollment)
+        stats.record_enrollment_change(
+            student.id, course, new_enrollment.semester, None, new_enrollment.status or "enrolled"
+        )
         db.session.commit()
+        publish_seat_counts(course.id)
 
         return make_response(
             jsonify(
@@ -454,7 +787,8 @@ def enroll_student():
         )
 
 
-@EnrollmentSystem.route("/enrollments/<int:enrollment_id>/status", methods=["PATCH"])
+@api.route("/enrollments/<int:enrollment_id>/status", methods=["PATCH"])
+@invalidates_read_cache
 def update_enrollment_status(enrollment_id):
     """Update the status of an enrollment (e.g., mark completed)"""
     try:
@@ -464,6 +798,9 @@ def update_enrollment_status(enrollment_id):
             return make_response(jsonify({"message": "invalid status"}), 400)
 
         enrollment = Enrollment.query.get_or_404(enrollment_id)
+        stats.record_enrollment_change(
+            enrollment.student_id, enrollment.course, enrollment.semester, enrollment.status, new_status
+        )
         enrollment.status = new_status
         if new_status == "completed":
             enrollment.completed_date = datetime.now(timezone.utc)
@@ -471,6 +808,7 @@ def update_enrollment_status(enrollment_id):
             enrollment.completed_date = None
 
         db.session.commit()
+        publish_seat_counts(enrollment.course_id)
         return make_response(
             jsonify({"message": "status updated", "enrollment": enrollment.json()}), 200
         )
@@ -481,13 +819,19 @@ def update_enrollment_status(enrollment_id):
         )
 
 
-@EnrollmentSystem.route("/enrollments/<int:enrollment_id>", methods=["DELETE"])
+@api.route("/enrollments/<int:enrollment_id>", methods=["DELETE"])
+@invalidates_read_cache
 def drop_course(enrollment_id):
     """Drop a course (delete enrollment)"""
     try:
         enrollment = Enrollment.query.get_or_404(enrollment_id)
+        course_id = enrollment.course_id
+        stats.record_enrollment_change(
+            enrollment.student_id, enrollment.course, enrollment.semester, enrollment.status, None
+        )
         db.session.delete(enrollment)
         db.session.commit()
+        publish_seat_counts(course_id)
         return make_response(jsonify({"message": "course dropped successfully"}), 200)
     except Exception as e:
         db.session.rollback()
@@ -496,18 +840,44 @@ def drop_course(enrollment_id):
         )
 
 
-@EnrollmentSystem.route("/courses/<int:course_id>/students", methods=["GET"])
+@api.route("/courses/seats/stream", methods=["GET"])
+def stream_seat_updates():
+    """Server-sent event stream of coalesced seat-count changes.
+    Clients resume with the Last-Event-ID header (EventSource does this automatically)
+    and should re-fetch /courses when they receive a 'resync' event.
+    """
+    raw_last = request.headers.get("Last-Event-ID") or request.args.get("since")
+    try:
+        last_seq = int(raw_last) if raw_last else None
+    except ValueError:
+        last_seq = None
+    if seat_hub.subscriber_count >= current_app.config["SEAT_STREAM_MAX_SUBSCRIBERS"]:
+        response = make_response(jsonify({"message": "Too many live update subscribers, try again later"}), 503)
+        response.headers["Retry-After"] = "30"
+        return response
+    if _relay_enabled():
+        seat_relay.start(db.engine)
+    return Response(
+        seat_hub.stream(last_seq),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@api.route("/courses/<int:course_id>/students", methods=["GET"])
+@coalesced(read_flight, ttl="READ_CACHE_TTL")
 def get_course_students(course_id):
     """Get all students enrolled in a specific course"""
     try:
         course = Course.query.get_or_404(course_id)
-        students = [
-            {
-                "student_id": enrollment.student.student_id,
-                "name": enrollment.student.student_name,
-            }
-            for enrollment in course.enrollments
-        ]
+        # Single joined query instead of lazily loading enrollment.student per row
+        rows = (
+            db.session.query(Student.student_id, Student.student_name)
+            .join(Enrollment, Enrollment.student_id == Student.id)
+            .filter(Enrollment.course_id == course.id)
+            .all()
+        )
+        students = [{"student_id": sid, "name": name} for sid, name in rows]
 
         return make_response(
             jsonify(
@@ -524,7 +894,7 @@ def get_course_students(course_id):
             jsonify({"message": "error getting course students", "error": str(e)}), 500
         )
 
-@EnrollmentSystem.route('/students/<int:student_id>/eligible-courses', methods=['GET'])
+@api.route('/students/<int:student_id>/eligible-courses', methods=['GET'])
 def get_eligible_courses(student_id):
     """Return courses the student is eligible to register for.
     Semantics (current):
@@ -558,6 +928,7 @@ def get_eligible_courses(student_id):
             .all()
         )
         satisfied_ids = set(r.course_id for r in satisfied_rows)
+        satisfied_ids |= archive.completed_course_ids(student.id)
 
         # 2) enrolled counts for all courses (single query)
         enrolled_counts = dict(
@@ -568,17 +939,36 @@ def get_eligible_courses(student_id):
             .all()
         )
 
-        # 3) fetch courses with prerequisites eager-loaded
-        courses = Course.query.options(joinedload(Course.prerequisites)).all()
+        # 3) courses with their prerequisites, from the shared snapshot when available
+        #    as (id, code, name, instructor, capacity, schedule, [(id, code, name), ...])
+        catalog = get_catalog()
+        if catalog is not None:
+            def brief(row):
+                return (catalog.ids[row], catalog.text(row, 'code'), catalog.text(row, 'name'))
+
+            courses = [
+                brief(row) + (
+                    catalog.text(row, 'instructor'),
+                    catalog.int_value(catalog.capacity, row),
+                    catalog.text(row, 'schedule'),
+                    [brief(p) for p in catalog.prereq_rows(row)],
+                )
+                for row in range(len(catalog))
+            ]
+        else:
+            courses = [
+                (c.id, c.course_code, c.course_name, c.instructor, c.max_students, c.schedule,
+                 [(p.id, p.course_code, p.course_name) for p in c.prerequisites])
+                for c in Course.query.options(joinedload(Course.prerequisites)).all()
+            ]
 
         results = []
-        for c in courses:
-            prereqs = c.prerequisites or []
-            missing = [p for p in prereqs if p.id not in satisfied_ids]
+        for course_id, code, name, instructor, max_students, schedule, prereqs in courses:
+            missing = [p for p in prereqs if p[0] not in satisfied_ids]
             eligible_by_prereqs = (len(prereqs) == 0) or (len(missing) == 0)
 
-            enrolled_count = enrolled_counts.get(c.id, 0)
-            capacity = c.max_students or 0
+            enrolled_count = enrolled_counts.get(course_id, 0)
+            capacity = max_students or 0
             full = enrolled_count >= capacity
 
             eligible = eligible_by_prereqs and (not full or include_full)
@@ -586,17 +976,17 @@ def get_eligible_courses(student_id):
                 continue
 
             results.append({
-                'id': c.id,
-                'code': c.course_code,
-                'name': c.course_name,
-                'instructor': c.instructor,
+                'id': course_id,
+                'code': code,
+                'name': name,
+                'instructor': instructor,
                 'capacity': capacity,
                 'enrolled': enrolled_count,
-                'schedule': c.schedule,
-                'prerequisites': [{'id': p.id, 'code': p.course_code, 'name': p.course_name} for p in prereqs],
+                'schedule': schedule,
+                'prerequisites': [{'id': p[0], 'code': p[1], 'name': p[2]} for p in prereqs],
                 'eligible': eligible,
                 'full': full,
-                'missing_prerequisites': [{'id': p.id, 'code': p.course_code, 'name': p.course_name} for p in missing],
+                'missing_prerequisites': [{'id': p[0], 'code': p[1], 'name': p[2]} for p in missing],
                 'note': 'course full' if full else None,
             })
 
@@ -612,8 +1002,216 @@ def get_eligible_courses(student_id):
         return make_response(jsonify({'message': 'error getting eligible courses', 'error': str(e)}), 500)
 
 
+@api.route("/exports/enrollments", methods=["GET"])
+@admin_required
+def export_enrollments():
+    """Stream all enrollments for a semester (joined with student and course) as CSV, Arrow or Parquet.
+    Contains student contact details, so it is admin only.
+    """
+    semester = request.args.get("semester")
+    fmt = (request.args.get("format") or "csv").lower()
+    if not semester:
+        return make_response(jsonify({"message": "semester is required"}), 400)
+    if fmt not in export.FORMATS:
+        return make_response(
+            jsonify({"message": "invalid format", "allowed": list(export.FORMATS)}), 400
+        )
+    # the semester comes from the URL; never echo it raw into a header
+    filename = secure_filename(f"enrollments_{semester}.{fmt}")
+    disposition = {"Content-Disposition": f'attachment; filename="{filename}"'}
+    try:
+        if fmt == "csv":
+            return Response(
+                stream_with_context(export.iter_csv(semester)),
+                mimetype="text/csv",
+                headers=disposition,
+            )
+        if fmt == "arrow":
+            return Response(
+                stream_with_context(export.iter_arrow_stream(semester)),
+                mimetype="application/vnd.apache.arrow.stream",
+                headers=disposition,
+            )
+        # Parquet writes its footer last, so spool to a temp file and send that
+        fd, path = tempfile.mkstemp(suffix=".parquet")
+        os.close(fd)
+        try:
+            export.write_export(semester, "parquet", path)
+        except Exception:
+            os.remove(path)
+            raise
+        response = send_file(path, mimetype="application/vnd.apache.parquet", as_attachment=True, download_name=filename)
+        response.call_on_close(lambda: os.remove(path))
+        return response
+    except Exception as e:
+        return make_response(
+            jsonify({"message": "error exporting enrollments", "error": str(e)}), 500
+        )
+
+
+@api.route("/semesters/archived", methods=["GET"])
+def get_archived_semesters():
+    """List semesters that have been moved to the enrollment archive"""
+    try:
+        semesters = ArchivedSemester.query.order_by(ArchivedSemester.archived_at).all()
+        return make_response(jsonify([s.json() for s in semesters]), 200)
+    except Exception as e:
+        return make_response(
+            jsonify({"message": "error getting archived semesters", "error": str(e)}), 500
+        )
+
+
+@api.route("/semesters/<semester>/archive", methods=["POST"])
+@invalidates_read_cache
+@admin_required
+def archive_semester(semester):
+    """Move all enrollments of a closed semester into the archive (admin only).
+    Refused while any enrollment is still enrolled or waitlisted, unless ?force=true.
+    """
+    try:
+        force = request.args.get("force", "false").lower() in ("1", "true", "yes")
+        record = archive.archive_semester(semester, force=force)
+        return make_response(
+            jsonify({"message": "semester archived", "semester": record.json()}), 200
+        )
+    except ValueError as e:
+        db.session.rollback()
+        return make_response(jsonify({"message": str(e)}), 400)
+    except Exception as e:
+        db.session.rollback()
+        return make_response(
+            jsonify({"message": "error archiving semester", "error": str(e)}), 500
+        )
+
+
+# Reporting (served from the aggregates maintained in stats.py)
+@api.route("/stats/courses", methods=["GET"])
+def get_course_stats():
+    """Enrolled/waitlisted/completed counts and fill rate for every course"""
+    try:
+        return make_response(jsonify(stats.course_reports()), 200)
+    except Exception as e:
+        return make_response(
+            jsonify({"message": "error getting course statistics", "error": str(e)}), 500
+        )
+
+
+@api.route("/stats/courses/<int:course_id>", methods=["GET"])
+def get_course_stat(course_id):
+    """Enrolled/waitlisted/completed counts and fill rate for one course"""
+    try:
+        reports = stats.course_reports(course_id)
+        if not reports:
+            return make_response(jsonify({"message": "course not found"}), 404)
+        return make_response(jsonify(reports[0]), 200)
+    except Exception as e:
+        return make_response(
+            jsonify({"message": "error getting course statistics", "error": str(e)}), 500
+        )
+
+
+@api.route("/stats/semesters/<semester>/credits", methods=["GET"])
+def get_semester_credit_stats(semester):
+    """Distribution of enrolled credits per student for a semester"""
+    try:
+        return make_response(jsonify(stats.semester_credit_report(semester)), 200)
+    except Exception as e:
+        return make_response(
+            jsonify({"message": "error getting credit statistics", "error": str(e)}), 500
+        )
+
+
+@api.route("/stats/prerequisites", methods=["GET"])
+def get_prerequisite_stats():
+    """Prerequisite pass-through rates, optionally filtered by ?course_id="""
+    try:
+        query = PrerequisiteStats.query
+        course_id = request.args.get("course_id", type=int)
+        if course_id is not None:
+            query = query.filter_by(course_id=course_id)
+        return make_response(jsonify([row.json() for row in query.all()]), 200)
+    except Exception as e:
+        return make_response(
+            jsonify({"message": "error getting prerequisite statistics", "error": str(e)}), 500
+        )
+
+
+@api.route("/stats/refresh", methods=["POST"])
+@admin_required
+def refresh_stats():
+    """Rebuild all statistics from the enrollments table (admin only)"""
+    try:
+        stats.refresh_stats()
+        return make_response(jsonify({"message": "statistics refreshed"}), 200)
+    except Exception as e:
+        db.session.rollback()
+        return make_response(
+            jsonify({"message": "error refreshing statistics", "error": str(e)}), 500
+        )
+
+
+# Profiling (admin only)
+@api.route("/admin/latency", methods=["GET"])
+@admin_required
+def get_latency_histograms():
+    """Latency histograms per route since start (or the last reset)"""
+    return make_response(jsonify(profiler.latency_report()), 200)
+
+
+@api.route("/admin/latency", methods=["DELETE"])
+@admin_required
+def reset_latency_histograms():
+    """Clear latency histograms and the slow-request log"""
+    profiler.reset()
+    return make_response(jsonify({"message": "profiling data reset"}), 200)
+
+
+@api.route("/admin/slow-requests", methods=["GET"])
+@admin_required
+def get_slow_requests():
+    """Requests slower than SLOW_REQUEST_MS or failing with 5xx, newest first"""
+    return make_response(
+        jsonify({"threshold_ms": profiler.slow_ms, "requests": list(reversed(profiler.slow_requests))}), 200
+    )
+
+
+@api.route("/admin/profile", methods=["POST"])
+@admin_required
+def start_profile():
+    """Sample request-thread stacks for ?seconds= (default 10) every ?interval_ms= (default 10)"""
+    data = request.get_json(silent=True) or {}
+    try:
+        seconds = float(data.get("seconds", request.args.get("seconds", 10)))
+        interval_ms = float(data.get("interval_ms", request.args.get("interval_ms", 10)))
+    except (TypeError, ValueError):
+        return make_response(jsonify({"message": "invalid seconds or interval_ms"}), 400)
+    raw_all = str(data.get("all_threads", request.args.get("all_threads", "false"))).lower()
+    try:
+        status = profiler.start_sampling(seconds, interval_ms, all_threads=raw_all in ("1", "true", "yes"))
+    except RuntimeError as e:
+        return make_response(jsonify({"message": str(e)}), 409)
+    return make_response(jsonify({"message": "profiling started", **status}), 202)
+
+
+@api.route("/admin/profile", methods=["GET"])
+@admin_required
+def get_profile():
+    """Sampling status, or ?format=collapsed for flame-graph input"""
+    if request.args.get("format") == "collapsed":
+        return Response(profiler.sampler.collapsed(), mimetype="text/plain")
+    return make_response(jsonify(profiler.sampler.json()), 200)
+
+
+@api.route("/admin/profile", methods=["DELETE"])
+@admin_required
+def stop_profile():
+    """Stop a running sampling session early"""
+    profiler.sampler.stop()
+    return make_response(jsonify({"message": "profiling stopped"}), 200)
+
+
 # Login, Register, Logout
-@EnrollmentSystem.route("/register_students", methods=["POST"])
+@api.route("/register_students", methods=["POST"])
 def register_student():
     """Adds a new student to the database"""
     try:
@@ -651,7 +1249,50 @@ def register_student():
         )
 
 
-@EnrollmentSystem.route("/login_students", methods=["POST"])
+@api.route("/register_students/bulk", methods=["POST"])
+@admin_required
+def register_students_bulk():
+    """Adds many students at once from a JSON array, a CSV body (text/csv) or an uploaded 'file' (admin only).
+    Each password hash costs ~0.1s of CPU, so requests are capped at BULK_REGISTER_MAX_ROWS
+    rows; import whole cohorts with `python provisioning.py`, which hashes in a process pool.
+    """
+    try:
+        upload = request.files.get("file")
+        if upload is not None:
+            text = upload.read().decode("utf-8-sig")
+            fmt = "json" if (upload.filename or "").lower().endswith(".json") else "csv"
+        elif request.is_json:
+            text, fmt = request.get_data(as_text=True), "json"
+        else:
+            text, fmt = request.get_data(as_text=True), "csv"
+        try:
+            rows = provisioning.parse_rows(text, fmt)
+        except ValueError as e:
+            return make_response(jsonify({"message": "invalid import payload", "error": str(e)}), 400)
+        max_rows = current_app.config["BULK_REGISTER_MAX_ROWS"]
+        if len(rows) > max_rows:
+            return make_response(
+                jsonify(
+                    {
+                        "message": f"at most {max_rows} students per request; "
+                        "use `python provisioning.py` for larger imports",
+                        "received": len(rows),
+                    }
+                ),
+                413,
+            )
+        # Hash in this thread: forking a process pool from a server worker is not safe
+        report = provisioning.provision_students(rows, workers=1)
+        status = 201 if report["created"] else 200
+        return make_response(jsonify({"message": "bulk registration finished", **report}), status)
+    except Exception as e:
+        db.session.rollback()
+        return make_response(
+            jsonify({"message": "error creating students", "error": str(e)}), 500
+        )
+
+
+@api.route("/login_students", methods=["POST"])
 def login_student():
     """Creates a session for a student"""
     data = request.get_json()
@@ -663,11 +1304,30 @@ def login_student():
         return make_response({"message": "Student with this ID does not exist"}, 404)
     # Use secure password verification
     if cur_student.check_password(password):
-        return make_response({"message": "Student Logged in"}, 201)
+        user = auth_tokens.AuthUser.from_student(cur_student)
+        user_cache.set(user.id, user)
+        flask_login.login_user(user)
+        token = auth_tokens.issue_token(current_app.config["SECRET_KEY"], cur_student)
+        return make_response(
+            {
+                "message": "Student Logged in",
+                "token": token,
+                "expires_in": auth_tokens.TOKEN_MAX_AGE,
+                "student": cur_student.json(),
+            },
+            201,
+        )
     return make_response({"message": "Wrong Password for Student"}, 400)
 
 
-@EnrollmentSystem.route("/logout_students", methods=["POST"])
+@api.route("/me", methods=["GET"])
+@flask_login.login_required
+def get_current_student():
+    """Identity of the logged-in student (session cookie or bearer token), no DB query"""
+    return make_response(jsonify(flask_login.current_user.json()), 200)
+
+
+@api.route("/logout_students", methods=["POST"])
 def logout_student():
     """Logs a student out of their session"""
     flask_login.logout_user()
@@ -675,4 +1335,11 @@ def logout_student():
 
 
 if __name__ == "__main__":
-    EnrollmentSystem.run(debug=True, port=8000)
+    import sys
+
+    app = create_app({"DEBUG": True})
+    init_db(app)
+    if sys.argv[1:] == ["init-db"]:
+        print("Database initialized.")
+    else:
+        app.run(debug=True, port=8000)
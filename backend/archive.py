@@ -0,0 +1,124 @@
+"""Archival of closed semesters out of the hot enrollments table.
+
+``archive_semester`` moves every enrollment of a semester into
+enrollments_archive and records the completed ones in the compact
+student_completed_courses summary, so prerequisite checks still see them while
+capacity counts, credit sums and eligibility queries only scan active terms.
+
+A semester that still has enrolled or waitlisted rows is refused unless forced.
+
+Usage:
+    python archive.py "Spring 2024" ["Fall 2024" ...] [--force]
+"""
+from sqlalchemy import delete, exists, func, insert, select
+
+import stats
+from models import db, Enrollment, EnrollmentArchive, CompletedCourse, ArchivedSemester
+
+# Rows in these statuses mean the term is still running
+OPEN_STATUSES = ("enrolled", "waitlisted")
+
+_COPY_COLUMNS = ["id", "student_id", "course_id", "enrolled_date", "semester", "status", "completed_date"]
+
+
+def is_archived(semester):
+    return ArchivedSemester.query.get(semester or "") is not None
+
+
+def completed_course_ids(student_id):
+    """Course ids the student has completed, in active or archived semesters (one query)."""
+    active = select(Enrollment.course_id).where(
+        Enrollment.student_id == student_id, Enrollment.status == "completed"
+    )
+    archived = select(CompletedCourse.course_id).where(CompletedCourse.student_id == student_id)
+    return {cid for (cid,) in db.session.execute(active.union(archived)).all()}
+
+
+def archive_semester(semester, refresh=True, force=False):
+    """Move a closed semester into the archive in one transaction and return its ArchivedSemester row.
+    Raises ValueError if any row is still enrolled or waitlisted, unless force=True.
+    With refresh=True the reporting aggregates are rebuilt afterwards.
+    """
+    if not semester:
+        raise ValueError("semester is required")
+    if is_archived(semester):
+        raise ValueError(f"semester {semester} is already archived")
+
+    in_semester = Enrollment.semester == semester
+
+    if not force:
+        still_open = db.session.execute(
+            select(func.count()).select_from(Enrollment).where(in_semester, Enrollment.status.in_(OPEN_STATUSES))
+        ).scalar()
+        if still_open:
+            raise ValueError(
+                f"semester {semester} still has {still_open} enrolled or waitlisted enrollments; "
+                "use force to archive it anyway"
+            )
+
+    # 1) lock the semester's rows so status changes wait for the move (no-op on SQLite)
+    db.session.execute(select(Enrollment.id).where(in_semester).with_for_update())
+
+    # 2) copy the rows to the archive
+    db.session.execute(
+        insert(EnrollmentArchive).from_select(
+            _COPY_COLUMNS,
+            select(*[getattr(Enrollment, c) for c in _COPY_COLUMNS]).where(in_semester),
+        )
+    )
+    copied = EnrollmentArchive.semester == semester
+
+    # 3) summary of the completed courses that were copied, skipping pairs already recorded
+    db.session.execute(
+        insert(CompletedCourse).from_select(
+            ["student_id", "course_id", "semester", "completed_date"],
+            select(
+                EnrollmentArchive.student_id,
+                EnrollmentArchive.course_id,
+                func.max(EnrollmentArchive.semester),
+                func.max(EnrollmentArchive.completed_date),
+            )
+            .where(copied, EnrollmentArchive.status == "completed")
+            .where(
+                ~exists().where(
+                    (CompletedCourse.student_id == EnrollmentArchive.student_id)
+                    & (CompletedCourse.course_id == EnrollmentArchive.course_id)
+                )
+            )
+            .group_by(EnrollmentArchive.student_id, EnrollmentArchive.course_id),
+        )
+    )
+
+    # 4) drop exactly the copied rows from the hot table. Each statement sees a new
+    # snapshot under READ COMMITTED, so a row committed after the copy must stay.
+    moved = db.session.execute(
+        delete(Enrollment).where(
+            in_semester, Enrollment.id.in_(select(EnrollmentArchive.id).where(copied))
+        )
+    ).rowcount
+
+    record = ArchivedSemester(semester=semester, rows=moved)
+    db.session.add(record)
+    db.session.commit()
+
+    if refresh:
+        stats.refresh_stats()
+    return record
+
+
+if __name__ == "__main__":
+    import argparse
+
+    p = argparse.ArgumentParser(description="Move closed semesters out of the enrollments table")
+    p.add_argument("semesters", nargs="+", help="Semester names exactly as stored in enrollments.semester")
+    p.add_argument("--force", action="store_true", help="Archive even if enrollments are still enrolled or waitlisted")
+    args = p.parse_args()
+
+    from app import create_app
+
+    with create_app().app_context():
+        for name in args.semesters:
+            rec = archive_semester(name, refresh=False, force=args.force)
+            print(f"Archived {rec.rows} enrollments from {name}")
+        stats.refresh_stats()
+    print("Archival complete.")
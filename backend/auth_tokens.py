@@ -0,0 +1,100 @@
+"""Stateless signed-token authentication and cached user loading.
+
+Tokens are issued by /login_students and signed with the app's SECRET_KEY via
+itsdangerous. Verifying one only checks the signature and age, so authenticated
+requests cost no database query and no password hash. Session-based logins go
+through ``load_user``, which is backed by a small TTL cache.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+import flask_login
+from itsdangerous import BadSignature, SignatureExpired, URLSafeTimedSerializer
+
+TOKEN_SALT = "student-auth"
+TOKEN_MAX_AGE = 8 * 60 * 60  # seconds
+
+
+class AuthUser(flask_login.UserMixin):
+    """Lightweight, DB-free stand-in for a logged-in Student."""
+
+    def __init__(self, id, student_id, name=""):
+        self.id = id
+        self.student_id = student_id
+        self.name = name
+
+    @classmethod
+    def from_student(cls, student):
+        return cls(student.id, student.student_id, student.student_name)
+
+    def json(self):
+        return {"id": self.id, "student_id": self.student_id, "name": self.name}
+
+
+class TTLCache:
+    """Thread-safe LRU cache whose entries expire after ``ttl`` seconds."""
+
+    def __init__(self, maxsize=4096, ttl=60.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            value, expires = entry
+            if expires < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (value, time.monotonic() + self.ttl)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def pop(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+def _serializer(secret_key):
+    return URLSafeTimedSerializer(secret_key, salt=TOKEN_SALT)
+
+
+def issue_token(secret_key, student):
+    """Return a signed token identifying the student."""
+    return _serializer(secret_key).dumps(
+        {"id": student.id, "sid": student.student_id, "name": student.student_name}
+    )
+
+
+def verify_token(secret_key, token, max_age=TOKEN_MAX_AGE):
+    """Return an AuthUser for a valid token, or None if it is bad or expired."""
+    try:
+        data = _serializer(secret_key).loads(token, max_age=max_age)
+    except (BadSignature, SignatureExpired):
+        return None
+    if not isinstance(data, dict) or "id" not in data:
+        return None
+    return AuthUser(data["id"], data.get("sid"), data.get("name", ""))
+
+
+def token_from_request(request):
+    """Extract a bearer token from the Authorization header, if present."""
+    header = request.headers.get("Authorization", "")
+    scheme, _, token = header.partition(" ")
+    if scheme.lower() == "bearer" and token:
+        return token.strip()
+    return None
@@ -0,0 +1,355 @@
+"""Compact, immutable catalog snapshot shared by worker processes via mmap.
+
+``publish_snapshot`` reads ``courses`` and ``course_prerequisites`` and writes a
+single binary file:
+
+    header | int32 columns (id, capacity, credits, 5 string refs)
+           | CSR prerequisite adjacency (offsets, row indices)
+           | interned string table (offsets, UTF-8 blob)
+
+The file is written next to its destination and moved into place with
+os.replace, so readers always see a complete snapshot. ``SnapshotReader`` maps
+the current file read-only; the int32 columns are memoryviews straight into the
+mapping, so every worker shares the same physical pages. Readers notice a new
+file (different inode) and remap it.
+
+Every change to ``courses`` or ``course_prerequisites``, including plain SQL
+from other tools, bumps ``catalog_version`` through database triggers
+(``install_version_triggers``, run by init-db). Workers poll that one-row
+counter and re-publish when it moves.
+
+The file lives at CATALOG_SNAPSHOT_PATH, or else in the temp directory under a
+name derived from the database URL, so apps on different databases never read
+each other's snapshot.
+
+Usage:
+    python catalog_snapshot.py [--path /path/to/catalog.snap]
+"""
+import bisect
+import hashlib
+import mmap
+import os
+import struct
+import tempfile
+import threading
+import time
+from array import array
+
+from sqlalchemy import select, text
+
+from models import db, Course, CatalogVersion, course_prerequisites
+
+MAGIC = b"CSNP"
+FORMAT_VERSION = 1
+# magic, format version, catalog digest, courses, edges, strings, blob bytes
+_HEADER = struct.Struct("=4sI16sIIII")
+NULL = -(2 ** 31)
+STRING_FIELDS = ("name", "code", "instructor", "description", "schedule")
+
+
+def default_path():
+    """Snapshot path for the current app's database (needs an app context)."""
+    path = os.environ.get("CATALOG_SNAPSHOT_PATH")
+    if path:
+        return path
+    url = db.engine.url.render_as_string(hide_password=False)
+    key = hashlib.blake2b(url.encode("utf-8"), digest_size=8).hexdigest()
+    return os.path.join(tempfile.gettempdir(), f"course_catalog-{key}.snap")
+
+
+_VERSIONED_TABLES = ("courses", "course_prerequisites")
+_BUMP_SQL = "UPDATE catalog_version SET version = version + 1 WHERE id = 1"
+
+
+def install_version_triggers():
+    """Create the catalog_version row and the triggers that bump it (idempotent).
+    Returns False for databases other than PostgreSQL and SQLite, which get no triggers.
+    """
+    if db.session.get(CatalogVersion, 1) is None:
+        db.session.add(CatalogVersion(id=1, version=0))
+        db.session.commit()
+    dialect = db.engine.dialect.name
+    if dialect == "postgresql":
+        statements = [
+            "CREATE OR REPLACE FUNCTION bump_catalog_version() RETURNS trigger "
+            f"LANGUAGE plpgsql AS $$ BEGIN {_BUMP_SQL}; RETURN NULL; END $$"
+        ]
+        for table in _VERSIONED_TABLES:
+            statements += [
+                f"DROP TRIGGER IF EXISTS {table}_catalog_version ON {table}",
+                f"CREATE TRIGGER {table}_catalog_version AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE "
+                f"ON {table} FOR EACH STATEMENT EXECUTE PROCEDURE bump_catalog_version()",
+            ]
+    elif dialect == "sqlite":
+        statements = [
+            f"CREATE TRIGGER IF NOT EXISTS {table}_catalog_version_{op.lower()} "
+            f"AFTER {op} ON {table} BEGIN {_BUMP_SQL}; END"
+            for table in _VERSIONED_TABLES
+            for op in ("INSERT", "UPDATE", "DELETE")
+        ]
+    else:
+        return False
+    with db.engine.begin() as conn:
+        for statement in statements:
+            conn.execute(text(statement))
+    return True
+
+
+def catalog_version():
+    """The catalog_version counter, read on its own connection; None if it is missing."""
+    with db.engine.connect() as conn:
+        return conn.execute(select(CatalogVersion.version).where(CatalogVersion.id == 1)).scalar()
+
+
+def _int_or_null(value):
+    return NULL if value is None else int(value)
+
+
+def build_snapshot_bytes():
+    """Serialize the current catalog; returns (digest, bytes)."""
+    rows = db.session.execute(
+        select(
+            Course.id,
+            Course.max_students,
+            Course.course_credits,
+            Course.course_name,
+            Course.course_code,
+            Course.instructor,
+            Course.description,
+            Course.schedule,
+        ).order_by(Course.id)
+    ).all()
+    edges = db.session.execute(
+        select(course_prerequisites.c.course_id, course_prerequisites.c.prereq_id).order_by(
+            course_prerequisites.c.course_id, course_prerequisites.c.prereq_id
+        )
+    ).all()
+
+    strings = []
+    interned = {}
+
+    def intern(value):
+        value = value or ""
+        idx = interned.get(value)
+        if idx is None:
+            idx = interned[value] = len(strings)
+            strings.append(value)
+        return idx
+
+    ids = array("i")
+    capacity = array("i")
+    credits = array("i")
+    refs = {field: array("i") for field in STRING_FIELDS}
+    for cid, cap, cred, *texts in rows:
+        ids.append(cid)
+        capacity.append(_int_or_null(cap))
+        credits.append(_int_or_null(cred))
+        for field, text in zip(STRING_FIELDS, texts):
+            refs[field].append(intern(text))
+
+    row_of = {cid: row for row, cid in enumerate(ids)}
+    adjacency = [[] for _ in ids]
+    for course_id, prereq_id in edges:
+        if course_id in row_of and prereq_id in row_of:
+            adjacency[row_of[course_id]].append(row_of[prereq_id])
+    offsets = array("i", [0])
+    indices = array("i")
+    for targets in adjacency:
+        indices.extend(targets)
+        offsets.append(len(indices))
+
+    encoded = [s.encode("utf-8") for s in strings]
+    string_offsets = array("i", [0])
+    for b in encoded:
+        string_offsets.append(string_offsets[-1] + len(b))
+    blob = b"".join(encoded)
+
+    body = b"".join(
+        [ids.tobytes(), capacity.tobytes(), credits.tobytes()]
+        + [refs[f].tobytes() for f in STRING_FIELDS]
+        + [offsets.tobytes(), indices.tobytes(), string_offsets.tobytes(), blob]
+    )
+    digest = hashlib.blake2b(body, digest_size=16).digest()
+    header = _HEADER.pack(MAGIC, FORMAT_VERSION, digest, len(ids), len(indices), len(strings), len(blob))
+    return digest, header + body
+
+
+def _current_digest(path):
+    """(digest, file size) of the published snapshot, or None if there is no valid header."""
+    try:
+        with open(path, "rb") as f:
+            head = f.read(_HEADER.size)
+            size = os.fstat(f.fileno()).st_size
+        magic, version, digest, *_ = _HEADER.unpack(head)
+        if magic == MAGIC and version == FORMAT_VERSION:
+            return digest, size
+    except (OSError, struct.error):
+        pass
+    return None
+
+
+def publish_snapshot(path=None):
+    """Write a new snapshot if the catalog changed. Returns True if a new file was published."""
+    path = path or default_path()
+    digest, data = build_snapshot_bytes()
+    # a matching digest with the wrong size is a truncated file; rewrite it
+    if _current_digest(path) == (digest, len(data)):
+        return False
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp = tempfile.mkstemp(dir=directory, prefix=".catalog-", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+    return True
+
+
+class CatalogSnapshot:
+    """Read-only view over one mapped snapshot file."""
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            self._stat = os.fstat(f.fileno())
+            if self._stat.st_size < _HEADER.size:
+                raise ValueError(f"{path} is not a catalog snapshot (file too short)")
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, digest, n, n_edges, n_strings, blob_len = _HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC or version != FORMAT_VERSION:
+            raise ValueError(f"{path} is not a catalog snapshot (format {FORMAT_VERSION})")
+        # 8 columns of n, offsets (n + 1), edges, string offsets (n_strings + 1), blob
+        expected = _HEADER.size + 4 * (8 * n + (n + 1) + n_edges + (n_strings + 1)) + blob_len
+        if len(self._mm) != expected:
+            raise ValueError(f"{path} is truncated or corrupt ({len(self._mm)} bytes, expected {expected})")
+        self.version = digest.hex()
+        self._n = n
+        view = memoryview(self._mm)
+        pos = _HEADER.size
+
+        def take(count):
+            nonlocal pos
+            col = view[pos:pos + 4 * count].cast("i")
+            pos += 4 * count
+            return col
+
+        self.ids = take(n)
+        self.capacity = take(n)
+        self.credits = take(n)
+        self._refs = {field: take(n) for field in STRING_FIELDS}
+        self.prereq_offsets = take(n + 1)
+        self.prereq_indices = take(n_edges)
+        self._string_offsets = take(n_strings + 1)
+        self._blob = view[pos:pos + blob_len]
+        self._decoded = {}
+
+    def __len__(self):
+        return self._n
+
+    def same_file(self, st):
+        return (st.st_ino, st.st_dev) == (self._stat.st_ino, self._stat.st_dev)
+
+    def string(self, idx):
+        s = self._decoded.get(idx)
+        if s is None:
+            start, end = self._string_offsets[idx], self._string_offsets[idx + 1]
+            s = self._decoded[idx] = str(self._blob[start:end], "utf-8")
+        return s
+
+    def text(self, row, field):
+        return self.string(self._refs[field][row])
+
+    def row_of(self, course_id):
+        """Row index for a course id, or None (ids are stored sorted)."""
+        row = bisect.bisect_left(self.ids, course_id)
+        if row < self._n and self.ids[row] == course_id:
+            return row
+        return None
+
+    def prereq_rows(self, row):
+        return self.prereq_indices[self.prereq_offsets[row]:self.prereq_offsets[row + 1]]
+
+    def int_value(self, column, row):
+        value = column[row]
+        return None if value == NULL else value
+
+    def search(self, q):
+        """Rows whose name, code or instructor contain q (case-insensitive)."""
+        q = q.lower()
+        return [
+            row
+            for row in range(self._n)
+            if any(q in self.text(row, f).lower() for f in ("name", "code", "instructor"))
+        ]
+
+    def course_json(self, row, enrolled):
+        """Same shape as models.Course.json()."""
+        return {
+            "id": self.ids[row],
+            "name": self.text(row, "name"),
+            "code": self.text(row, "code"),
+            "instructor": self.text(row, "instructor"),
+            "capacity": self.int_value(self.capacity, row),
+            "description": self.text(row, "description"),
+            "credits": self.int_value(self.credits, row),
+            "schedule": self.text(row, "schedule"),
+            "enrolled": enrolled,
+            "prerequisites": [self.text(p, "code") for p in self.prereq_rows(row)],
+        }
+
+
+class SnapshotReader:
+    """Per-process handle that remaps the snapshot when a new file is published."""
+
+    def __init__(self, path=None, check_interval=1.0):
+        # None: default_path() of the current app
+        self.path = path
+        self.check_interval = check_interval
+        self._snapshot = None
+        self._checked = 0.0
+        self._lock = threading.Lock()
+
+    def invalidate(self):
+        """Force the next get() to re-check the file (e.g. right after publishing)."""
+        self._checked = 0.0
+
+    def get(self):
+        """Current snapshot, or None if none has been published yet.
+        Raises ValueError if the file is not a valid snapshot.
+        """
+        now = time.monotonic()
+        path = self.path or default_path()
+        if self._snapshot is not None and self._snapshot.path == path and now - self._checked < self.check_interval:
+            return self._snapshot
+        with self._lock:
+            self._checked = now
+            try:
+                st = os.stat(path)
+            except FileNotFoundError:
+                self._snapshot = None
+                return None
+            if self._snapshot is None or self._snapshot.path != path or not self._snapshot.same_file(st):
+                # Old mappings stay valid for requests still holding them.
+                self._snapshot = None
+                self._snapshot = CatalogSnapshot(path)
+            return self._snapshot
+
+
+if __name__ == "__main__":
+    import argparse
+
+    p = argparse.ArgumentParser(description="Publish the compact catalog snapshot")
+    p.add_argument("--path", help="Default: CATALOG_SNAPSHOT_PATH, or a temp file keyed by the DB URL")
+    args = p.parse_args()
+
+    from app import create_app
+
+    with create_app().app_context():
+        path = args.path or default_path()
+        changed = publish_snapshot(path)
+    print(f"Published {path}" if changed else "Catalog unchanged; snapshot left as is.")
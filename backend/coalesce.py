@@ -0,0 +1,117 @@
+"""Single-flight coalescing for idempotent GET endpoints.
+
+Concurrent identical requests (same path and normalized query args) share one
+execution of the view: the first caller runs it, the rest wait and reuse its
+encoded body. Successful responses can also be kept in a short micro-cache,
+which is cleared when a write to the data they show succeeds
+(``invalidates_read_cache`` in app.py). Clearing bumps a generation counter:
+calls started before the clear neither fill the cache nor take new waiters.
+"""
+import functools
+import threading
+import time
+from collections import OrderedDict
+
+from flask import Response, current_app, request
+
+
+class _Call:
+    __slots__ = ("event", "result", "error", "generation")
+
+    def __init__(self, generation):
+        self.generation = generation
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    def __init__(self, cache_size=1024):
+        self.cache_size = cache_size
+        self._inflight = {}
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self._generation = 0
+        self.executions = 0
+        self.shared = 0
+
+    def do(self, key, fn, ttl=0.0):
+        """Return fn() for key, sharing one in-flight call (and an optional ttl-second cache)."""
+        with self._lock:
+            cached = self._cache.get(key)
+            if cached is not None:
+                expires, result = cached
+                if expires > time.monotonic():
+                    self.shared += 1
+                    return result
+                del self._cache[key]
+            call = self._inflight.get(key)
+            # a call started before the last clear_cache() may have read old data
+            leader = call is None or call.generation != self._generation
+            if leader:
+                call = self._inflight[key] = _Call(self._generation)
+                self.executions += 1
+            else:
+                self.shared += 1
+
+        if not leader:
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                if self._inflight.get(key) is call:
+                    del self._inflight[key]
+                if (
+                    ttl > 0
+                    and call.error is None
+                    and call.result[1] < 300
+                    and call.generation == self._generation
+                ):
+                    self._cache[key] = (time.monotonic() + ttl, call.result)
+                    while len(self._cache) > self.cache_size:
+                        self._cache.popitem(last=False)
+            call.event.set()
+
+    def clear_cache(self):
+        with self._lock:
+            self._generation += 1
+            self._cache.clear()
+
+
+def request_key():
+    """Route + normalized args: keys sorted, values stripped, blank values dropped."""
+    args = tuple(
+        sorted((k, v.strip()) for k, v in request.args.items(multi=True) if v.strip() != "")
+    )
+    return (request.path, args)
+
+
+def coalesced(flight, ttl=0.0):
+    """Decorator for GET views whose output depends only on the path and query args.
+    ttl is in seconds, or the name of an app.config key read on each request.
+    """
+
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            def run():
+                resp = view(*args, **kwargs)
+                # Encode once; every waiter gets its own Response built from these bytes.
+                return resp.get_data(), resp.status_code, resp.mimetype
+
+            seconds = current_app.config.get(ttl, 0.0) if isinstance(ttl, str) else ttl
+            body, status, mimetype = flight.do(request_key(), run, seconds)
+            return Response(body, status=status, mimetype=mimetype)
+
+        return wrapper
+
+    return decorator
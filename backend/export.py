@@ -0,0 +1,171 @@
+"""Bulk export of a semester's enrollments joined to students and courses.
+
+Rows are read through a server-side cursor in chunks (``yield_per``), so memory
+stays bounded by the chunk size regardless of semester size. CSV needs nothing
+extra; Arrow and Parquet output require ``pyarrow``
+(``pip install -r requirements-tools.txt``).
+
+Usage:
+    python export.py --semester "Fall 2025" --format parquet --out fall2025.parquet
+"""
+import csv
+import io
+
+from sqlalchemy import select
+
+import archive
+from models import db, Student, Course, Enrollment, EnrollmentArchive
+
+CHUNK_SIZE = 10000
+FORMATS = ("csv", "arrow", "parquet")
+
+# (column name, source, attribute, arrow type name); source "enrollment" is
+# resolved to Enrollment or EnrollmentArchive depending on the semester
+COLUMNS = [
+    ("enrollment_id", "enrollment", "id", "int64"),
+    ("semester", "enrollment", "semester", "string"),
+    ("status", "enrollment", "status", "string"),
+    ("enrolled_date", "enrollment", "enrolled_date", "timestamp"),
+    ("completed_date", "enrollment", "completed_date", "timestamp"),
+    ("student_pk", "student", "id", "int64"),
+    ("student_id", "student", "student_id", "string"),
+    ("student_name", "student", "student_name", "string"),
+    ("student_email", "student", "student_email", "string"),
+    ("major", "student", "major", "string"),
+    ("year", "student", "year", "int64"),
+    ("course_id", "course", "id", "int64"),
+    ("course_code", "course", "course_code", "string"),
+    ("course_name", "course", "course_name", "string"),
+    ("credits", "course", "course_credits", "int64"),
+    ("instructor", "course", "instructor", "string"),
+]
+COLUMN_NAMES = [name for name, _, _, _ in COLUMNS]
+
+
+def _require_pyarrow():
+    try:
+        import pyarrow
+    except ImportError as e:
+        raise RuntimeError("Arrow/Parquet export requires pyarrow (pip install -r requirements-tools.txt).") from e
+    return pyarrow
+
+
+def iter_chunks(semester, chunk_size=CHUNK_SIZE):
+    """Yield lists of row tuples (in COLUMNS order) for one semester."""
+    source = EnrollmentArchive if archive.is_archived(semester) else Enrollment
+    models = {"enrollment": source, "student": Student, "course": Course}
+    stmt = (
+        select(*[getattr(models[src], attr) for _, src, attr, _ in COLUMNS])
+        .select_from(source)
+        .join(Student, Student.id == source.student_id)
+        .join(Course, Course.id == source.course_id)
+        .where(source.semester == semester)
+        .order_by(source.id)
+        .execution_options(yield_per=chunk_size)
+    )
+    result = db.session.execute(stmt)
+    try:
+        for partition in result.partitions():
+            yield partition
+    finally:
+        result.close()
+
+
+def iter_csv(semester, chunk_size=CHUNK_SIZE):
+    """Yield CSV text one chunk at a time, starting with the header row."""
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    writer.writerow(COLUMN_NAMES)
+    for rows in iter_chunks(semester, chunk_size):
+        writer.writerows(rows)
+        yield buf.getvalue()
+        buf.seek(0)
+        buf.truncate()
+    if buf.tell():
+        yield buf.getvalue()
+
+
+def arrow_schema():
+    pa = _require_pyarrow()
+    types = {"int64": pa.int64(), "string": pa.string(), "timestamp": pa.timestamp("us")}
+    return pa.schema([(name, types[kind]) for name, _, _, kind in COLUMNS])
+
+
+def iter_record_batches(semester, chunk_size=CHUNK_SIZE):
+    """Yield one pyarrow RecordBatch per chunk, built column-wise."""
+    pa = _require_pyarrow()
+    schema = arrow_schema()
+    for rows in iter_chunks(semester, chunk_size):
+        columns = list(zip(*rows))
+        yield pa.record_batch(
+            [pa.array(col, type=field.type) for col, field in zip(columns, schema)],
+            schema=schema,
+        )
+
+
+def iter_arrow_stream(semester, chunk_size=CHUNK_SIZE):
+    """Yield the bytes of an Arrow IPC stream, one record batch at a time."""
+    pa = _require_pyarrow()
+    buf = io.BytesIO()
+    writer = pa.ipc.new_stream(buf, arrow_schema())
+    for batch in iter_record_batches(semester, chunk_size):
+        writer.write_batch(batch)
+        yield buf.getvalue()
+        buf.seek(0)
+        buf.truncate()
+    writer.close()
+    yield buf.getvalue()
+
+
+def write_export(semester, fmt, path, chunk_size=CHUNK_SIZE):
+    """Write a semester export to path and return the number of rows written."""
+    if fmt not in FORMATS:
+        raise ValueError(f"unknown export format: {fmt}")
+    count = 0
+    if fmt == "csv":
+        with open(path, "w", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            writer.writerow(COLUMN_NAMES)
+            for rows in iter_chunks(semester, chunk_size):
+                writer.writerows(rows)
+                count += len(rows)
+        return count
+
+    pa = _require_pyarrow()
+    schema = arrow_schema()
+    if fmt == "parquet":
+        import pyarrow.parquet as pq
+
+        writer = pq.ParquetWriter(path, schema)
+    else:
+        writer = pa.ipc.new_file(path, schema)
+    try:
+        for batch in iter_record_batches(semester, chunk_size):
+            if fmt == "parquet":
+                writer.write_table(pa.Table.from_batches([batch]))
+            else:
+                writer.write_batch(batch)
+            count += batch.num_rows
+    finally:
+        writer.close()
+    return count
+
+
+if __name__ == "__main__":
+    import argparse
+    import time
+
+    p = argparse.ArgumentParser(description="Export a semester's enrollments with student and course details")
+    p.add_argument("--semester", required=True, help="Semester to export (matches enrollments.semester)")
+    p.add_argument("--format", choices=FORMATS, default="csv")
+    p.add_argument("--out", required=True, help="Output file path")
+    p.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+    args = p.parse_args()
+
+    from app import create_app
+
+    with create_app().app_context():
+        started = time.perf_counter()
+        n = write_export(args.semester, args.format, args.out, args.chunk_size)
+        elapsed = time.perf_counter() - started
+    print(f"Exported {n} rows to {args.out} in {elapsed:.2f}s")
@@ -105,6 +105,12 @@ class Course(db.Model):
 
 class Enrollment(db.Model):
     __tablename__ = "enrollments"
+    # Hot-path lookups: capacity counts, per-student credit sums and eligibility
+    __table_args__ = (
+        db.Index("ix_enrollments_course_status", "course_id", "status"),
+        db.Index("ix_enrollments_student_status", "student_id", "status"),
+        db.Index("ix_enrollments_semester", "semester"),
+    )
     id = db.Column(db.Integer, primary_key=True)
     student_id = db.Column(db.Integer, db.ForeignKey("students.id"), nullable=False)
     course_id = db.Column(db.Integer, db.ForeignKey("courses.id"), nullable=False)
@@ -133,3 +139,141 @@ class Enrollment(db.Model):
             if self.completed_date
             else None,
         }
+
+
+# ---------------------------------------------------------------------------
+# Semester archival (maintained by archive.py)
+# ---------------------------------------------------------------------------
+
+
+class EnrollmentArchive(db.Model):
+    """Enrollments of closed semesters, moved out of the hot enrollments table."""
+
+    __tablename__ = "enrollments_archive"
+    __table_args__ = (
+        db.Index("ix_enrollments_archive_semester", "semester"),
+        db.Index("ix_enrollments_archive_student", "student_id"),
+    )
+    # surrogate key: SQLite may hand a freed enrollments.id to a new enrollment,
+    # so original ids are not unique across archived semesters
+    archive_id = db.Column(db.Integer, primary_key=True)
+    # the original enrollments.id
+    id = db.Column(db.Integer, nullable=False, index=True)
+    student_id = db.Column(db.Integer, db.ForeignKey("students.id"), nullable=False)
+    course_id = db.Column(db.Integer, db.ForeignKey("courses.id"), nullable=False)
+    enrolled_date = db.Column(db.DateTime)
+    semester = db.Column(db.String(20))
+    status = db.Column(db.String(20))
+    completed_date = db.Column(db.DateTime, nullable=True)
+
+    course = db.relationship("Course", viewonly=True)
+
+    def json(self):
+        """Same shape as Enrollment.json()."""
+        return {
+            "id": self.id,
+            "student_id": self.student_id,
+            "course_id": self.course_id,
+            "course_name": self.course.course_name,
+            "course_code": self.course.course_code,
+            "enrolled_date": self.enrolled_date.isoformat()
+            if self.enrolled_date
+            else None,
+            "semester": self.semester,
+            "status": self.status,
+            "completed_date": self.completed_date.isoformat()
+            if self.completed_date
+            else None,
+        }
+
+
+class CompletedCourse(db.Model):
+    """Compact per-student record of courses completed in archived semesters."""
+
+    __tablename__ = "student_completed_courses"
+    student_id = db.Column(db.Integer, db.ForeignKey("students.id"), primary_key=True)
+    course_id = db.Column(db.Integer, db.ForeignKey("courses.id"), primary_key=True)
+    semester = db.Column(db.String(20))
+    completed_date = db.Column(db.DateTime, nullable=True)
+
+
+class CatalogVersion(db.Model):
+    """Single-row counter that database triggers bump on every change to courses or
+    course_prerequisites (see catalog_snapshot.install_version_triggers)."""
+
+    __tablename__ = "catalog_version"
+    id = db.Column(db.Integer, primary_key=True)
+    version = db.Column(db.BigInteger, nullable=False, default=0)
+
+
+class ArchivedSemester(db.Model):
+    __tablename__ = "archived_semesters"
+    semester = db.Column(db.String(20), primary_key=True)
+    archived_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
+    rows = db.Column(db.Integer, nullable=False, default=0)
+
+    def json(self):
+        return {
+            "semester": self.semester,
+            "archived_at": self.archived_at.isoformat() if self.archived_at else None,
+            "rows": self.rows,
+        }
+
+
+# ---------------------------------------------------------------------------
+# Materialized reporting aggregates (maintained by stats.py)
+# ---------------------------------------------------------------------------
+
+
+class CourseStats(db.Model):
+    __tablename__ = "course_stats"
+    course_id = db.Column(db.Integer, db.ForeignKey("courses.id"), primary_key=True)
+    enrolled = db.Column(db.Integer, nullable=False, default=0)
+    waitlisted = db.Column(db.Integer, nullable=False, default=0)
+    completed = db.Column(db.Integer, nullable=False, default=0)
+    dropped = db.Column(db.Integer, nullable=False, default=0)
+
+    def json(self):
+        return {
+            "course_id": self.course_id,
+            "enrolled": self.enrolled,
+            "waitlisted": self.waitlisted,
+            "completed": self.completed,
+            "dropped": self.dropped,
+        }
+
+
+class StudentSemesterCredits(db.Model):
+    __tablename__ = "student_semester_credits"
+    student_id = db.Column(db.Integer, db.ForeignKey("students.id"), primary_key=True)
+    # '' stands in for enrollments without a semester
+    semester = db.Column(db.String(20), primary_key=True)
+    credits = db.Column(db.Integer, nullable=False, default=0)
+
+
+class SemesterCreditStats(db.Model):
+    __tablename__ = "semester_credit_stats"
+    semester = db.Column(db.String(20), primary_key=True)
+    credits = db.Column(db.Integer, primary_key=True)
+    # number of students carrying exactly `credits` enrolled credits this semester
+    students = db.Column(db.Integer, nullable=False, default=0)
+
+
+class PrerequisiteStats(db.Model):
+    __tablename__ = "prerequisite_stats"
+    course_id = db.Column(db.Integer, db.ForeignKey("courses.id"), primary_key=True)
+    prereq_id = db.Column(db.Integer, db.ForeignKey("courses.id"), primary_key=True)
+    # students who completed the prerequisite
+    prereq_completed = db.Column(db.Integer, nullable=False, default=0)
+    # ...and of those, students who went on to take the dependent course
+    advanced = db.Column(db.Integer, nullable=False, default=0)
+
+    def json(self):
+        rate = (self.advanced / self.prereq_completed) if self.prereq_completed else None
+        return {
+            "course_id": self.course_id,
+            "prereq_id": self.prereq_id,
+            "prereq_completed": self.prereq_completed,
+            "advanced": self.advanced,
+            "pass_through_rate": rate,
+        }
@@ -0,0 +1,310 @@
+"""Built-in profiling surface: slow-request log, per-route latency histograms
+and an on-demand statistical sampler that exports collapsed stacks.
+
+``RequestProfiler.init_app(app)`` hooks request timing and SQL capture into the
+app. The admin endpoints in app.py expose the data. They are gated by the
+ADMIN_TOKEN environment variable, sent as the X-Admin-Token header.
+
+Settings (app.config, filled from the environment by create_app):
+    SLOW_REQUEST_MS   threshold for the slow-request log (default 500)
+    SLOW_REQUEST_LOG  number of slow requests kept in memory (default 200)
+
+The sampler works with the sync, gthread and gevent worker classes. Under gevent
+it runs on a native OS thread (not a greenlet), so it keeps sampling while a
+request holds the CPU, and it reads the frames of in-flight request greenlets.
+Other async workers (eventlet) are not supported.
+"""
+import _thread
+import os
+import sys
+import threading
+import time
+from collections import Counter, deque
+
+from flask import g, has_request_context, request
+from sqlalchemy import event
+
+from models import db
+
+# Upper bounds (ms) of the latency histogram buckets; the last bucket is open-ended
+BUCKETS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000)
+MAX_QUERIES_PER_REQUEST = 100
+MAX_SAMPLE_SECONDS = 120
+
+
+class LatencyHistogram:
+    __slots__ = ("counts", "total_ms", "max_ms")
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS_MS) + 1)
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+
+    def add(self, ms):
+        i = 0
+        while i < len(BUCKETS_MS) and ms > BUCKETS_MS[i]:
+            i += 1
+        self.counts[i] += 1
+        self.total_ms += ms
+        self.max_ms = max(self.max_ms, ms)
+
+    def quantile(self, q):
+        """Upper bound of the bucket holding the q-th quantile (None for the open bucket)."""
+        n = sum(self.counts)
+        if not n:
+            return None
+        rank = q * n
+        seen = 0
+        for i, c in enumerate(self.counts):
+            seen += c
+            if seen >= rank:
+                return BUCKETS_MS[i] if i < len(BUCKETS_MS) else None
+        return None
+
+    def json(self):
+        n = sum(self.counts)
+        return {
+            "count": n,
+            "mean_ms": round(self.total_ms / n, 2) if n else None,
+            "max_ms": round(self.max_ms, 2),
+            "p50_ms": self.quantile(0.50),
+            "p95_ms": self.quantile(0.95),
+            "p99_ms": self.quantile(0.99),
+            "buckets": {
+                (f"<={b}" if i < len(BUCKETS_MS) else f">{BUCKETS_MS[-1]}"): c
+                for i, (b, c) in enumerate(zip(BUCKETS_MS + (None,), self.counts))
+            },
+        }
+
+
+def _gevent_patched():
+    """True when gevent has monkey-patched threading (gunicorn -k gevent)."""
+    monkey = sys.modules.get("gevent.monkey")
+    return monkey is not None and monkey.is_module_patched("threading")
+
+
+def _native(module, name):
+    """The unpatched function from module: real OS threads even under gevent."""
+    if _gevent_patched():
+        from gevent import monkey
+
+        return monkey.get_original(module, name)
+    return getattr(sys.modules[module], name)
+
+
+class StackSampler:
+    """Samples Python stacks of in-flight requests at a fixed interval.
+
+    The sampling loop runs on a native thread and only touches a native lock,
+    so gevent's hub never has to schedule it.
+    """
+
+    def __init__(self):
+        self._lock = _native("_thread", "allocate_lock")()
+        self._running = False
+        self._stop = False
+        self.stacks = Counter()
+        self.samples = 0
+        self.started_at = None
+        self.ends_at = None
+        self.interval = None
+
+    @property
+    def running(self):
+        return self._running
+
+    def start(self, seconds, interval, frames):
+        """frames() returns the frames to sample; it is called from the sampler thread."""
+        with self._lock:
+            if self._running:
+                raise RuntimeError("a profiling session is already running")
+            self.stacks = Counter()
+            self.samples = 0
+            self.interval = interval
+            self.started_at = time.time()
+            self.ends_at = self.started_at + seconds
+            self._stop = False
+            self._running = True
+        try:
+            _native("_thread", "start_new_thread")(self._run, (seconds, interval, frames))
+        except BaseException:
+            self._running = False
+            raise
+
+    def stop(self):
+        self._stop = True
+
+    def _run(self, seconds, interval, frames):
+        sleep = _native("time", "sleep")
+        deadline = time.monotonic() + seconds
+        try:
+            while not self._stop and time.monotonic() < deadline:
+                sample = [_collapse(frame) for frame in frames()]
+                with self._lock:
+                    self.stacks.update(sample)
+                    self.samples += 1
+                sleep(interval)
+        finally:
+            self.ends_at = time.time()
+            self._running = False
+
+    def collapsed(self):
+        """Brendan Gregg's collapsed-stack format (flamegraph.pl, speedscope)."""
+        with self._lock:
+            stacks = self.stacks.most_common()
+        return "".join(f"{stack} {count}\n" for stack, count in stacks)
+
+    def json(self):
+        return {
+            "running": self.running,
+            "started_at": self.started_at,
+            "ends_at": self.ends_at,
+            "interval_ms": self.interval * 1000 if self.interval else None,
+            "samples": self.samples,
+            "distinct_stacks": len(self.stacks),
+        }
+
+
+def _collapse(frame):
+    parts = []
+    while frame is not None:
+        code = frame.f_code
+        module = frame.f_globals.get("__name__", os.path.basename(code.co_filename))
+        parts.append(f"{module}:{code.co_name}")
+        frame = frame.f_back
+    return ";".join(reversed(parts))
+
+
+class RequestProfiler:
+    def __init__(self, slow_ms=None, log_size=None):
+        # explicit arguments win over app.config in init_app
+        self._slow_ms = slow_ms
+        self._log_size = log_size
+        self.slow_ms = float(slow_ms if slow_ms is not None else 500)
+        self.slow_requests = deque(maxlen=int(log_size or 200))
+        self.histograms = {}
+        self.sampler = StackSampler()
+        # in-flight request -> native thread running it; the request is its
+        # greenlet under gevent, else its thread ident
+        self._active = {}
+        self._task = self._native_ident = None
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        if self._slow_ms is None:
+            self.slow_ms = float(app.config.get("SLOW_REQUEST_MS", 500))
+        log_size = int(self._log_size or app.config.get("SLOW_REQUEST_LOG", 200))
+        if log_size != self.slow_requests.maxlen:
+            self.slow_requests = deque(self.slow_requests, maxlen=log_size)
+        app.before_request(self._before_request)
+        app.after_request(self._after_request)
+        app.teardown_request(self._teardown_request)
+        with app.app_context():
+            # Engines exist after db.init_app; listening does not open a connection.
+            for engine in db.engines.values():
+                event.listen(engine, "before_cursor_execute", self._before_cursor)
+                event.listen(engine, "after_cursor_execute", self._after_cursor)
+
+    # request hooks
+
+    def _before_request(self):
+        g._prof_start = time.perf_counter()
+        g._prof_queries = []
+        task = self._current_task()
+        self._active[task] = self._native_ident()
+
+    def _after_request(self, response):
+        start = g.pop("_prof_start", None)
+        if start is None:
+            return response
+        ms = (time.perf_counter() - start) * 1000
+        route = request.url_rule.rule if request.url_rule else "<unmatched>"
+        key = f"{request.method} {route}"
+        with self._lock:
+            hist = self.histograms.get(key)
+            if hist is None:
+                hist = self.histograms[key] = LatencyHistogram()
+            hist.add(ms)
+        if ms >= self.slow_ms or response.status_code >= 500:
+            queries = g.get("_prof_queries", [])
+            entry = {
+                "at": time.time(),
+                "method": request.method,
+                "route": route,
+                "path": request.path,
+                "args": request.args.to_dict(flat=False),
+                "status": response.status_code,
+                "duration_ms": round(ms, 2),
+                "query_count": len(queries),
+                "query_ms": round(sum(q["ms"] for q in queries), 2),
+                "queries": queries,
+            }
+            self.slow_requests.append(entry)
+            print(f"Slow request: {key} {response.status_code} {ms:.1f}ms, {len(queries)} queries")
+        return response
+
+    def _teardown_request(self, exc):
+        self._active.pop(self._current_task(), None)
+
+    def _current_task(self):
+        if self._task is None:
+            # resolved on the first request: gevent patches after the app module is imported
+            if _gevent_patched():
+                from greenlet import getcurrent
+
+                self._task, self._native_ident = getcurrent, _native("_thread", "get_ident")
+            else:
+                self._task = self._native_ident = _thread.get_ident
+        return self._task()
+
+    def _request_frames(self):
+        """Current frame of every in-flight request (called from the sampler thread)."""
+        current = sys._current_frames()
+        frames = []
+        for task, ident in list(self._active.items()):
+            # a suspended greenlet keeps its frame; the running one (or a thread) is on its OS thread
+            frame = getattr(task, "gr_frame", None) or current.get(ident)
+            if frame is not None:
+                frames.append(frame)
+        return frames
+
+    # SQL capture
+
+    def _before_cursor(self, conn, cursor, statement, parameters, context, executemany):
+        if has_request_context():
+            g._prof_query_start = time.perf_counter()
+
+    def _after_cursor(self, conn, cursor, statement, parameters, context, executemany):
+        if not has_request_context():
+            return
+        start = g.pop("_prof_query_start", None)
+        queries = g.get("_prof_queries")
+        if start is None or queries is None or len(queries) >= MAX_QUERIES_PER_REQUEST:
+            return
+        queries.append({"sql": statement, "ms": round((time.perf_counter() - start) * 1000, 3)})
+
+    # admin surface
+
+    def start_sampling(self, seconds, interval_ms=10.0, all_threads=False):
+        seconds = max(0.1, min(float(seconds), MAX_SAMPLE_SECONDS))
+        interval = max(1.0, float(interval_ms)) / 1000
+        if all_threads:
+            get_ident = _native("_thread", "get_ident")
+
+            def frames():
+                # every OS thread except the sampler itself
+                own = get_ident()
+                return [frame for ident, frame in sys._current_frames().items() if ident != own]
+        else:
+            frames = self._request_frames
+        self.sampler.start(seconds, interval, frames)
+        return self.sampler.json()
+
+    def latency_report(self):
+        with self._lock:
+            return {key: hist.json() for key, hist in sorted(self.histograms.items())}
+
+    def reset(self):
+        with self._lock:
+            self.histograms.clear()
+        self.slow_requests.clear()
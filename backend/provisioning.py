@@ -0,0 +1,199 @@
+"""Bulk student import / account provisioning.
+
+Accepts rows shaped like the POST /register_students body (student_id or id, name,
+email, major, year, password). Existing student_ids are found with a single
+set-based query, initial passwords are hashed (in a process pool when run from
+the command line) and new rows are inserted in batches. The API endpoint hashes
+in the request thread, yielding between hashes so a gevent worker keeps serving
+other requests; it never forks worker processes from a server worker. A blank
+password creates an account without one (it cannot log in until a password is set).
+
+Usage:
+    python provisioning.py cohort.csv [--batch-size 1000] [--workers 8]
+"""
+import csv
+import io
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from sqlalchemy import insert
+from werkzeug.security import generate_password_hash
+
+from models import db, Student
+
+BATCH_SIZE = 1000
+# Below this many passwords the pool start-up costs more than it saves
+POOL_THRESHOLD = 64
+
+
+def parse_rows(text, fmt):
+    """Parse a CSV (with header) or JSON array payload into a list of dicts."""
+    if fmt == "json":
+        data = json.loads(text)
+        if isinstance(data, dict):
+            data = data.get("students") or []
+        if not isinstance(data, list):
+            raise ValueError("expected a JSON array of students")
+        return data
+    if fmt == "csv":
+        return list(csv.DictReader(io.StringIO(text)))
+    raise ValueError(f"unknown import format: {fmt}")
+
+
+def _hash_password(password):
+    # Keep Student.set_password semantics: pre-hashed values are stored as-is.
+    if password is None:
+        return None
+    if password.startswith("pbkdf2:"):
+        return password
+    return generate_password_hash(password)
+
+
+def _hash_passwords(passwords, workers=1):
+    """Hash sequentially unless workers asks for a pool (None means all cores)."""
+    if len(passwords) < POOL_THRESHOLD or workers == 1:
+        hashes = []
+        for p in passwords:
+            hashes.append(_hash_password(p))
+            # each hash is ~0.1s of CPU; yield so other requests (greenlets, threads) run
+            time.sleep(0)
+        return hashes
+    workers = workers or os.cpu_count() or 1
+    chunksize = max(1, len(passwords) // (workers * 4))
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(_hash_password, passwords, chunksize=chunksize))
+
+
+def _normalize(row):
+    """Map an input row to Student column values; raises ValueError for bad rows."""
+    student_id = str(row.get("student_id") or row.get("id") or "").strip()
+    if not student_id:
+        raise ValueError("student_id (or id) is required")
+    if len(student_id) > 15:
+        raise ValueError("student_id is longer than 15 characters")
+    year = row.get("year")
+    try:
+        year = int(year) if year not in (None, "") else 2025
+    except (TypeError, ValueError):
+        raise ValueError(f"invalid year: {year!r}")
+    password = row.get("password")
+    if password is not None:
+        password = str(password)
+    return {
+        "student_id": student_id,
+        "student_name": row.get("name") or "",
+        "student_email": row.get("email") or "",
+        "major": row.get("major") or "",
+        "year": year,
+        # a blank CSV cell means no password, never an empty one
+        "password": password or None,
+    }
+
+
+def _insert_batch(batch, errors):
+    """Insert one batch; on failure retry row by row so errors point at single rows."""
+    try:
+        db.session.execute(insert(Student), [values for _, values in batch])
+        db.session.commit()
+        return len(batch)
+    except Exception:
+        db.session.rollback()
+    created = 0
+    for index, values in batch:
+        try:
+            db.session.execute(insert(Student), [values])
+            db.session.commit()
+            created += 1
+        except Exception as e:
+            db.session.rollback()
+            errors.append({"row": index, "student_id": values["student_id"], "error": str(e)})
+    return created
+
+
+def provision_students(rows, batch_size=BATCH_SIZE, workers=1):
+    """Create student accounts for rows and return a summary report.
+    The report lists per-row errors (row numbers are 1-based) and rows/sec throughput.
+    workers > 1 (or None for all cores) hashes passwords in a process pool; CLI only.
+    """
+    started = time.perf_counter()
+    errors = []
+    skipped = []
+
+    # 1) validate and de-duplicate within the payload
+    pending = []
+    seen = set()
+    for index, row in enumerate(rows, start=1):
+        try:
+            if not isinstance(row, dict):
+                raise ValueError("row must be an object")
+            values = _normalize(row)
+        except ValueError as e:
+            errors.append({"row": index, "student_id": None, "error": str(e)})
+            continue
+        if values["student_id"] in seen:
+            errors.append({"row": index, "student_id": values["student_id"], "error": "duplicate student_id in import"})
+            continue
+        seen.add(values["student_id"])
+        pending.append((index, values))
+
+    # 2) one set-based query for student_ids that already exist
+    existing = set()
+    if seen:
+        existing = {
+            sid for (sid,) in db.session.query(Student.student_id).filter(Student.student_id.in_(seen)).all()
+        }
+    new_rows = []
+    for index, values in pending:
+        if values["student_id"] in existing:
+            skipped.append({"row": index, "student_id": values["student_id"]})
+        else:
+            new_rows.append((index, values))
+
+    # 3) hash initial passwords
+    hashes = _hash_passwords([values["password"] for _, values in new_rows], workers)
+    for (_, values), hashed in zip(new_rows, hashes):
+        values["password"] = hashed
+
+    # 4) batched inserts
+    created = 0
+    for start in range(0, len(new_rows), batch_size):
+        created += _insert_batch(new_rows[start:start + batch_size], errors)
+
+    elapsed = time.perf_counter() - started
+    total = len(rows)
+    return {
+        "received": total,
+        "created": created,
+        "skipped_existing": skipped,
+        "errors": sorted(errors, key=lambda e: e["row"]),
+        "seconds": round(elapsed, 3),
+        "rows_per_sec": round(total / elapsed, 1) if elapsed > 0 else None,
+    }
+
+
+if __name__ == "__main__":
+    import argparse
+
+    p = argparse.ArgumentParser(description="Bulk-create student accounts from a CSV or JSON file")
+    p.add_argument("path", help="CSV (with header) or JSON array of students")
+    p.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    p.add_argument("--workers", type=int, default=None, help="Password hashing processes (default: all cores)")
+    args = p.parse_args()
+
+    fmt = "json" if args.path.lower().endswith(".json") else "csv"
+    with open(args.path, "r", encoding="utf-8") as f:
+        rows = parse_rows(f.read(), fmt)
+
+    from app import create_app
+
+    with create_app().app_context():
+        report = provision_students(rows, batch_size=args.batch_size, workers=args.workers)
+    for err in report["errors"]:
+        print(f"row {err['row']}: {err['error']}")
+    print(
+        f"Created {report['created']} of {report['received']} students "
+        f"({len(report['skipped_existing'])} already existed, {len(report['errors'])} errors) "
+        f"in {report['seconds']}s, {report['rows_per_sec']} rows/sec"
+    )
@@ -0,0 +1,185 @@
+"""Live seat-count updates for the course catalog (server-sent events).
+
+``SeatUpdateHub`` fans updates out to the subscribers of one process. With
+PostgreSQL, ``PostgresSeatRelay`` carries updates between processes: writers
+send them with NOTIFY, and every process that has subscribers runs one LISTEN
+thread that feeds its local hub. Other databases only fan out within a single
+process.
+
+Each open stream holds its request for as long as the client stays connected,
+so serve the app with an async worker class (``gunicorn -k gevent``, see
+README.md); a sync worker is tied up by a single subscriber.
+"""
+import json
+import select
+import threading
+import time
+from collections import deque
+
+from sqlalchemy import text
+
+# Postgres limits a NOTIFY payload to 8000 bytes; stay well below it
+NOTIFY_CHUNK = 200
+
+
+class SeatUpdateHub:
+    """In-process fan-out hub for live seat-count updates.
+
+    Writers call ``publish`` after an enrollment change is committed. Updates
+    for the same course are coalesced over ``window`` seconds and flushed as a
+    single batch ``{"seq": n, "seats": {course_id: [enrolled, capacity]}}``.
+
+    Every batch is encoded once and kept in a fixed-size ring shared by all
+    subscribers, so a subscriber only costs the sequence number it has seen.
+    A subscriber that falls further behind than the ring gets a ``resync``
+    event and should re-fetch ``GET /courses``.
+    """
+
+    def __init__(self, window=0.25, backlog=256, heartbeat=15.0):
+        self.window = window
+        self.heartbeat = heartbeat
+        self._pending = {}
+        self._batches = deque(maxlen=backlog)
+        self._seq = 0
+        self._subscribers = 0
+        self._lock = threading.Lock()
+        self._cond = threading.Condition(self._lock)
+        self._flusher = None
+
+    @property
+    def seq(self):
+        return self._seq
+
+    @property
+    def subscriber_count(self):
+        return self._subscribers
+
+    def publish(self, course_id, enrolled, capacity):
+        """Record the latest seat count for a course; only the last value per window is sent."""
+        with self._lock:
+            self._pending[int(course_id)] = (int(enrolled), int(capacity or 0))
+            if self._flusher is None or not self._flusher.is_alive():
+                self._flusher = threading.Thread(
+                    target=self._flush_loop, name="seat-update-flusher", daemon=True
+                )
+                self._flusher.start()
+
+    def _flush_loop(self):
+        while True:
+            time.sleep(self.window)
+            with self._cond:
+                if not self._pending:
+                    # Nothing published during the last window; let the thread exit
+                    # and be restarted by the next publish.
+                    self._flusher = None
+                    return
+                pending, self._pending = self._pending, {}
+                self._seq += 1
+                payload = json.dumps(
+                    {
+                        "seq": self._seq,
+                        "seats": {str(cid): list(v) for cid, v in pending.items()},
+                    },
+                    separators=(",", ":"),
+                )
+                event = f"id: {self._seq}\nevent: seats\ndata: {payload}\n\n".encode("utf-8")
+                self._batches.append((self._seq, event))
+                self._cond.notify_all()
+
+    def _resync_event(self, seq):
+        data = json.dumps({"seq": seq}, separators=(",", ":"))
+        return f"id: {seq}\nevent: resync\ndata: {data}\n\n".encode("utf-8")
+
+    def _collect(self, last_seq):
+        """Return (new_last_seq, events) for everything newer than last_seq. Caller holds the lock."""
+        if self._seq <= last_seq:
+            return last_seq, []
+        oldest = self._batches[0][0] if self._batches else self._seq + 1
+        if last_seq < oldest - 1:
+            return self._seq, [self._resync_event(self._seq)]
+        return self._seq, [event for seq, event in self._batches if seq > last_seq]
+
+    def stream(self, last_seq=None):
+        """Yield encoded server-sent events for one subscriber until the client disconnects."""
+        with self._lock:
+            self._subscribers += 1
+            if last_seq is None or last_seq > self._seq:
+                last_seq = self._seq
+        try:
+            # Tell the client which sequence it is starting from.
+            yield f"retry: 3000\nid: {last_seq}\nevent: hello\ndata: {{\"seq\":{last_seq}}}\n\n".encode("utf-8")
+            while True:
+                with self._cond:
+                    if self._seq <= last_seq:
+                        self._cond.wait(self.heartbeat)
+                    last_seq, events = self._collect(last_seq)
+                if events:
+                    for event in events:
+                        yield event
+                else:
+                    yield b": keepalive\n\n"
+        finally:
+            with self._lock:
+                self._subscribers -= 1
+
+
+class PostgresSeatRelay:
+    """Carries seat counts between processes over Postgres LISTEN/NOTIFY.
+
+    ``notify`` queues the counts on the session's transaction; Postgres delivers
+    them on commit to every listening process, including the sender. ``start``
+    launches the listener thread of the current process (once per process, so
+    it is safe to call per request and after a fork).
+    """
+
+    def __init__(self, hub, channel="seat_updates", poll_interval=5.0):
+        self.hub = hub
+        self.channel = channel
+        self.poll_interval = poll_interval
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def notify(self, session, seats):
+        """seats: iterable of (course_id, enrolled, capacity). Caller commits."""
+        seats = [[int(cid), int(enrolled), int(capacity or 0)] for cid, enrolled, capacity in seats]
+        for start in range(0, len(seats), NOTIFY_CHUNK):
+            session.execute(
+                text("SELECT pg_notify(:channel, :payload)"),
+                {"channel": self.channel, "payload": json.dumps(seats[start:start + NOTIFY_CHUNK], separators=(",", ":"))},
+            )
+
+    def start(self, engine):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(
+                    target=self._listen, args=(engine,), name="seat-update-listener", daemon=True
+                )
+                self._thread.start()
+
+    def _listen(self, engine):
+        while True:
+            raw = None
+            try:
+                # A dedicated connection, taken out of the pool for good
+                raw = engine.raw_connection()
+                raw.detach()
+                conn = raw.driver_connection
+                conn.autocommit = True
+                with conn.cursor() as cur:
+                    cur.execute(f'LISTEN "{self.channel}"')
+                while True:
+                    if not select.select([conn], [], [], self.poll_interval)[0]:
+                        continue
+                    conn.poll()
+                    while conn.notifies:
+                        for cid, enrolled, capacity in json.loads(conn.notifies.pop(0).payload):
+                            self.hub.publish(cid, enrolled, capacity)
+            except Exception as e:
+                print(f"Seat update listener failed, reconnecting: {e}")
+                time.sleep(1.0)
+            finally:
+                if raw is not None:
+                    try:
+                        raw.close()
+                    except Exception:
+                        pass
@@ -2,9 +2,10 @@ import json
 import os
 from typing import Dict
 
-# Import the Flask app and models
-from app import EnrollmentSystem
+# Import the Flask app factory and models
+from app import create_app, init_db
 from models import db, Course
+from catalog_snapshot import publish_snapshot
 
 DATA_FILE = os.path.join(os.path.dirname(__file__), 'CS_Curriculum_JSON.json')
 
@@ -17,7 +18,9 @@ def load_json(path: str):
 def seed_courses(drop_existing: bool = False):
     data = load_json(DATA_FILE)
 
-    with EnrollmentSystem.app_context():
+    app = create_app()
+    init_db(app)
+    with app.app_context():
         if drop_existing:
             print('Dropping existing courses table data...')
             # WARNING: destructive — delete only courses and the association rows
@@ -95,6 +98,10 @@ def seed_courses(drop_existing: bool = False):
         db.session.commit()
         print(f'Attached prerequisites for {updated} courses (phase 2)')
 
+        # Workers read the catalog from the shared snapshot; publish the new one
+        if publish_snapshot():
+            print('Published catalog snapshot')
+
 
 if __name__ == '__main__':
     import argparse
@@ -0,0 +1,302 @@
+"""Materialized reporting aggregates.
+
+The tables in models.py (CourseStats, StudentSemesterCredits, SemesterCreditStats,
+PrerequisiteStats) are kept current in two ways:
+
+- ``record_enrollment_change`` applies the delta of a single enrollment write and
+  is called from the enrollment endpoints inside the same transaction.
+- ``refresh_stats`` rebuilds everything with set-based queries. Run it once after
+  deploying, and on a schedule (``python stats.py``) to repair any drift.
+
+Course and credit figures cover active (non-archived) semesters; prerequisite
+pass-through rates use the full history including archived semesters.
+"""
+from sqlalchemy import case, func, insert, select, delete, literal
+
+from models import (
+    db,
+    Course,
+    Enrollment,
+    course_prerequisites,
+    EnrollmentArchive,
+    CompletedCourse,
+    CourseStats,
+    StudentSemesterCredits,
+    SemesterCreditStats,
+    PrerequisiteStats,
+)
+
+# Statuses counted as "took the course" for prerequisite pass-through
+TAKEN_STATUSES = ("enrolled", "completed", "waitlisted")
+
+_STATUS_COLUMNS = {
+    "enrolled": "enrolled",
+    "waitlisted": "waitlisted",
+    "completed": "completed",
+    "dropped": "dropped",
+}
+
+
+def _upsert(model, keys, deltas, returning=None):
+    """INSERT keys+deltas, or add deltas in-database to the existing row, as one statement.
+    Returns the result, or None when the dialect has no ON CONFLICT upsert.
+    """
+    dialect = db.session.get_bind().dialect.name
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    elif dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    else:
+        return None
+    table = model.__table__
+    stmt = dialect_insert(table).values(**keys, **deltas)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[table.c[k] for k in keys],
+        set_={col: table.c[col] + stmt.excluded[col] for col in deltas},
+    )
+    if returning is not None:
+        stmt = stmt.returning(table.c[returning])
+    return db.session.execute(stmt)
+
+
+def _bump(model, keys, **deltas):
+    """Add deltas to the aggregate row identified by keys, creating it if missing.
+    A single upsert with in-database increments, so concurrent writers neither
+    lose updates nor race to insert the same key.
+    """
+    deltas = {k: v for k, v in deltas.items() if v}
+    if not deltas:
+        return
+    if _upsert(model, keys, deltas) is not None:
+        return
+    updated = model.query.filter_by(**keys).update(
+        {getattr(model, col): getattr(model, col) + delta for col, delta in deltas.items()},
+        synchronize_session=False,
+    )
+    if not updated:
+        db.session.add(model(**keys, **deltas))
+
+
+def _update_credit_totals(student_id, semester, delta):
+    keys = {"student_id": student_id, "semester": semester}
+    result = _upsert(StudentSemesterCredits, keys, {"credits": delta}, returning="credits")
+    if result is not None:
+        new_total = result.scalar_one()
+    else:
+        # row lock so the histogram move below matches the stored total
+        row = StudentSemesterCredits.query.filter_by(**keys).with_for_update().first()
+        new_total = (row.credits if row else 0) + delta
+        if row:
+            row.credits = new_total
+        else:
+            db.session.add(StudentSemesterCredits(**keys, credits=new_total))
+    old_total = new_total - delta
+    # students with no enrolled credits are not part of the distribution
+    if old_total > 0:
+        _bump(SemesterCreditStats, {"semester": semester, "credits": old_total}, students=-1)
+    if new_total > 0:
+        _bump(SemesterCreditStats, {"semester": semester, "credits": new_total}, students=1)
+
+
+def _update_prerequisite_stats(student_id, course, old_status, new_status):
+    dependents = list(course.dependent_courses or [])
+    prereqs = list(course.prerequisites or [])
+    if not dependents and not prereqs:
+        return
+
+    other_ids = {c.id for c in dependents} | {p.id for p in prereqs}
+    statuses = {}
+    for course_id, status in (
+        Enrollment.query.with_entities(Enrollment.course_id, Enrollment.status)
+        .filter(Enrollment.student_id == student_id, Enrollment.course_id.in_(other_ids))
+        .all()
+    ):
+        statuses.setdefault(course_id, set()).add(status)
+    # completions from archived semesters
+    for (course_id,) in (
+        CompletedCourse.query.with_entities(CompletedCourse.course_id)
+        .filter(CompletedCourse.student_id == student_id, CompletedCourse.course_id.in_(other_ids))
+        .all()
+    ):
+        statuses.setdefault(course_id, set()).add("completed")
+
+    # this course as a prerequisite of its dependents
+    completed_delta = int(new_status == "completed") - int(old_status == "completed")
+    if completed_delta:
+        for dep in dependents:
+            took_dependent = bool(statuses.get(dep.id, set()) & set(TAKEN_STATUSES))
+            _bump(
+                PrerequisiteStats,
+                {"course_id": dep.id, "prereq_id": course.id},
+                prereq_completed=completed_delta,
+                advanced=completed_delta if took_dependent else 0,
+            )
+
+    # this course as the dependent of its prerequisites
+    taken_delta = int(new_status in TAKEN_STATUSES) - int(old_status in TAKEN_STATUSES)
+    if taken_delta:
+        for prereq in prereqs:
+            if "completed" in statuses.get(prereq.id, set()):
+                _bump(
+                    PrerequisiteStats,
+                    {"course_id": course.id, "prereq_id": prereq.id},
+                    advanced=taken_delta,
+                )
+
+
+def record_enrollment_change(student_id, course, semester, old_status, new_status):
+    """Apply one enrollment transition to the aggregates.
+    old_status is None for a new enrollment; new_status is None for a deleted one.
+    Call before committing so the aggregates commit (or roll back) with the write.
+    """
+    if old_status == new_status:
+        return
+    semester = semester or ""
+
+    deltas = {}
+    if old_status in _STATUS_COLUMNS:
+        deltas[_STATUS_COLUMNS[old_status]] = -1
+    if new_status in _STATUS_COLUMNS:
+        col = _STATUS_COLUMNS[new_status]
+        deltas[col] = deltas.get(col, 0) + 1
+    _bump(CourseStats, {"course_id": course.id}, **deltas)
+
+    credits = course.course_credits or 0
+    credit_delta = credits * (int(new_status == "enrolled") - int(old_status == "enrolled"))
+    if credit_delta:
+        _update_credit_totals(student_id, semester, credit_delta)
+
+    _update_prerequisite_stats(student_id, course, old_status, new_status)
+
+
+def refresh_stats():
+    """Rebuild all aggregates from the enrollments table and commit."""
+    for model in (CourseStats, SemesterCreditStats, StudentSemesterCredits, PrerequisiteStats):
+        db.session.execute(delete(model))
+
+    def count_status(status):
+        return func.coalesce(func.sum(case((Enrollment.status == status, 1), else_=0)), 0)
+
+    db.session.execute(
+        insert(CourseStats).from_select(
+            ["course_id", "enrolled", "waitlisted", "completed", "dropped"],
+            select(
+                Enrollment.course_id,
+                count_status("enrolled"),
+                count_status("waitlisted"),
+                count_status("completed"),
+                count_status("dropped"),
+            ).group_by(Enrollment.course_id),
+        )
+    )
+
+    semester = func.coalesce(Enrollment.semester, literal(""))
+    db.session.execute(
+        insert(StudentSemesterCredits).from_select(
+            ["student_id", "semester", "credits"],
+            select(
+                Enrollment.student_id,
+                semester,
+                func.coalesce(func.sum(Course.course_credits), 0),
+            )
+            .join(Course, Course.id == Enrollment.course_id)
+            .where(Enrollment.status == "enrolled")
+            .group_by(Enrollment.student_id, semester),
+        )
+    )
+
+    db.session.execute(
+        insert(SemesterCreditStats).from_select(
+            ["semester", "credits", "students"],
+            select(
+                StudentSemesterCredits.semester,
+                StudentSemesterCredits.credits,
+                func.count(),
+            )
+            .where(StudentSemesterCredits.credits > 0)
+            .group_by(StudentSemesterCredits.semester, StudentSemesterCredits.credits),
+        )
+    )
+
+    # Pass-through rates use the full history, including archived semesters
+    history = (
+        select(Enrollment.student_id, Enrollment.course_id, Enrollment.status)
+        .union_all(
+            select(EnrollmentArchive.student_id, EnrollmentArchive.course_id, EnrollmentArchive.status)
+        )
+        .subquery("history")
+    )
+    done = history.alias("done")
+    took = history.alias("took")
+    cp = course_prerequisites
+    db.session.execute(
+        insert(PrerequisiteStats).from_select(
+            ["course_id", "prereq_id", "prereq_completed", "advanced"],
+            select(
+                cp.c.course_id,
+                cp.c.prereq_id,
+                func.count(func.distinct(done.c.student_id)),
+                func.count(func.distinct(took.c.student_id)),
+            )
+            .join(done, (done.c.course_id == cp.c.prereq_id) & (done.c.status == "completed"))
+            .outerjoin(
+                took,
+                (took.c.course_id == cp.c.course_id)
+                & (took.c.student_id == done.c.student_id)
+                & (took.c.status.in_(TAKEN_STATUSES)),
+            )
+            .group_by(cp.c.course_id, cp.c.prereq_id),
+        )
+    )
+    db.session.commit()
+
+
+def _course_report(course_id, code, capacity, row):
+    data = row.json() if row else CourseStats(
+        course_id=course_id, enrolled=0, waitlisted=0, completed=0, dropped=0
+    ).json()
+    capacity = capacity or 0
+    data["code"] = code
+    data["capacity"] = capacity
+    data["fill_rate"] = (data["enrolled"] / capacity) if capacity else None
+    return data
+
+
+def course_reports(course_id=None):
+    """Aggregate counts plus fill rate for every course (or one), in a single
+    query: courses outer-joined to course_stats.
+    """
+    query = (
+        db.session.query(Course.id, Course.course_code, Course.max_students, CourseStats)
+        .outerjoin(CourseStats, CourseStats.course_id == Course.id)
+        .order_by(Course.id)
+    )
+    if course_id is not None:
+        query = query.filter(Course.id == course_id)
+    return [_course_report(*row) for row in query.all()]
+
+
+def semester_credit_report(semester):
+    """Credit-load histogram and average credits per student for one semester."""
+    rows = (
+        SemesterCreditStats.query.filter_by(semester=semester or "")
+        .filter(SemesterCreditStats.students > 0)
+        .order_by(SemesterCreditStats.credits)
+        .all()
+    )
+    students = sum(r.students for r in rows)
+    total_credits = sum(r.credits * r.students for r in rows)
+    return {
+        "semester": semester,
+        "students": students,
+        "average_credits": (total_credits / students) if students else None,
+        "distribution": {str(r.credits): r.students for r in rows},
+    }
+
+
+if __name__ == "__main__":
+    from app import create_app
+
+    with create_app().app_context():
+        refresh_stats()
+    print("Statistics refreshed.")
@@ -137,6 +137,23 @@ const CourseCatalog = () => {
     fetchCourses();
   }, []);
 
+  // Apply live seat-count updates pushed by the server instead of polling
+  useEffect(() => {
+    const applySeats = (seats: Record<string, [number, number]>) => (list: Course[]) =>
+      list.map(c => {
+        const update = seats[String(c.id)];
+        return update ? { ...c, enrolled: update[0], capacity: update[1] } : c;
+      });
+    const unsubscribe = courseService.subscribeSeatUpdates(
+      (seats) => {
+        setCourses(applySeats(seats));
+        setVisibleCourses(applySeats(seats));
+      },
+      () => fetchCourses({ forceRefresh: true })
+    );
+    return unsubscribe;
+  }, []);
+
   // Fetch for refresh or search
   const fetchCourses = async (opts?: { forceRefresh?: boolean }) => {
     setLoading(true);
@@ -2,6 +2,19 @@ import { Course, Student, Enrollment } from "../types";
 
 const API_BASE_URL = "http://127.0.0.1:8000";
 
+// Signed token from /login_students, sent as "Authorization: Bearer <token>".
+// Only attach it to requests that are preflighted anyway (JSON bodies, PATCH,
+// DELETE): on a plain GET the header would add a CORS preflight to every call.
+function authHeaders(headers: Record<string, string> = {}): Record<string, string> {
+  try {
+    const token = sessionStorage.getItem("authToken");
+    if (token) return { ...headers, Authorization: `Bearer ${token}` };
+  } catch {
+    // ignore storage errors
+  }
+  return headers;
+}
+
 export const courseService = {
   // Simple in-memory cache with sessionStorage hydration
   _courseCache: null as null | { data: Course[]; fetchedAt: number },
@@ -66,6 +79,25 @@ export const courseService = {
     return response.json();
   },
 
+  // Subscribe to live seat-count batches ({ courseId: [enrolled, capacity] }).
+  // onResync is called when the client missed updates and should re-fetch the catalog.
+  subscribeSeatUpdates(
+    onSeats: (seats: Record<string, [number, number]>) => void,
+    onResync: () => void
+  ): () => void {
+    const source = new EventSource(`${API_BASE_URL}/courses/seats/stream`);
+    source.addEventListener("seats", (e) => {
+      try {
+        const payload = JSON.parse((e as MessageEvent).data);
+        onSeats(payload.seats || {});
+      } catch {
+        // ignore malformed events
+      }
+    });
+    source.addEventListener("resync", () => onResync());
+    return () => source.close();
+  },
+
   async searchCourses(query: string): Promise<Course[]> {
     const response = await fetch(
       `${API_BASE_URL}/courses/search?q=${encodeURIComponent(query)}`
@@ -82,7 +114,7 @@ export const studentService = {
     return response.json();
   },
 
-  async getStudentCourses(id: string): Promise<{ student: string; courses: Course[]; enrollments: Enrollment[] }> {
+  async getStudentCourses(id: string): Promise<{ student: string; courses: Course[]; enrollments: Enrollment[]; archived: Enrollment[] }> {
     const response = await fetch(`${API_BASE_URL}/students/${id}/courses`);
     if (!response.ok) throw new Error("Failed to fetch student courses");
     return response.json();
@@ -101,7 +133,7 @@ export const studentService = {
   async updateStudent(id: string, data: Partial<Student>): Promise<Student> {
     const response = await fetch(`${API_BASE_URL}/students/${id}`, {
       method: "PATCH",
-      headers: { "Content-Type": "application/json" },
+      headers: authHeaders({ "Content-Type": "application/json" }),
       body: JSON.stringify(data),
     });
     if (!response.ok) throw new Error("Failed to update student");
@@ -117,7 +149,7 @@ export const enrollmentService = {
   ): Promise<Enrollment> {
     const response = await fetch(`${API_BASE_URL}/enrollments`, {
       method: "POST",
-      headers: { "Content-Type": "application/json" },
+      headers: authHeaders({ "Content-Type": "application/json" }),
       body: JSON.stringify({ student_id: studentId, course_id: courseId }),
     });
     if (!response.ok) {
@@ -139,6 +171,7 @@ export const enrollmentService = {
       `${API_BASE_URL}/enrollments/${enrollmentId}`,
       {
         method: "DELETE",
+        headers: authHeaders(),
       }
     );
     if (!response.ok) throw new Error("Failed to drop course");
@@ -159,15 +192,17 @@ export const authService = {
       throw new Error(data.message || "Login failed");
     }
     
-    // Fetch full student data after successful login
-    // Get all students and find the one with matching student_id
-    const studentResponse = await fetch(`${API_BASE_URL}/students`);
-    if (!studentResponse.ok) {
-      throw new Error("Failed to fetch student data");
+    // Keep the signed token for authenticated requests
+    if (data.token) {
+      try {
+        sessionStorage.setItem("authToken", data.token);
+      } catch {
+        // ignore storage errors
+      }
     }
-    const students = await studentResponse.json();
-    const student = students.find((s: any) => s.student_id === studentId);
-    
+
+    // The login response includes the student record
+    const student: Student | undefined = data.student;
     if (!student) {
       throw new Error("Student data not found");
     }
@@ -206,8 +241,15 @@ export const authService = {
   },
 
   async logout(): Promise<void> {
+    const headers = authHeaders();
+    try {
+      sessionStorage.removeItem("authToken");
+    } catch {
+      // ignore storage errors
+    }
     const response = await fetch(`${API_BASE_URL}/logout_students`, {
       method: "POST",
+      headers,
     });
     if (!response.ok) throw new Error("Logout failed");
   },